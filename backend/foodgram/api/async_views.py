@@ -0,0 +1,212 @@
+import asyncio
+from functools import wraps
+
+from asgiref.sync import sync_to_async
+from django.contrib.auth import get_user_model
+from django.contrib.auth.models import AnonymousUser
+from django.db import close_old_connections
+from django.http import HttpResponse
+from django.urls import path
+from django.utils.cache import get_conditional_response
+from rest_framework import exceptions
+from rest_framework.renderers import JSONRenderer
+from rest_framework.request import Request
+
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow
+from .authentication import CachedTokenAuthentication
+from .cache import (get_cache_key, get_cache_timeout, get_response_cache,
+                    get_validators, set_validators)
+from .indexes import ingredient_index
+from .misc import get_recipes_limit
+from .pagination import CustomPageNumberPagination
+from .serializers import (IngredientSerializer, RecipeReadSerializer,
+                          RecipeShortSerializer, TagSerializer,
+                          UserFollowSerializer)
+from .views import (IngredientViewSet, RecipeViewSet, TagViewSet,
+                    UserViewSet, with_limited_recipes)
+
+User = get_user_model()
+
+authenticator = CachedTokenAuthentication()
+
+
+def run_sync(func, *args, **kwargs):
+    def call():
+        close_old_connections()
+        try:
+            return func(*args, **kwargs)
+        finally:
+            close_old_connections()
+    return sync_to_async(call, thread_sensitive=False)()
+
+
+def render(data, status=200):
+    return HttpResponse(
+        JSONRenderer().render(data),
+        status=status,
+        content_type='application/json',
+    )
+
+
+def render_error(error):
+    response = render(
+        error.detail if isinstance(error.detail, (list, dict))
+        else {'detail': error.detail},
+        error.status_code
+    )
+    if isinstance(error, (exceptions.AuthenticationFailed,
+                          exceptions.NotAuthenticated)):
+        response['WWW-Authenticate'] = authenticator.keyword
+    return response
+
+
+def set_prefetched(instance, name, objects):
+    queryset = getattr(instance, name).all()
+    queryset._result_cache = list(objects)
+    queryset._prefetch_done = True
+    if not hasattr(instance, '_prefetched_objects_cache'):
+        instance._prefetched_objects_cache = {}
+    instance._prefetched_objects_cache[name] = queryset
+
+
+def async_api_view(fallback):
+    def decorator(handler):
+        @wraps(handler)
+        async def view(request, *args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return await sync_to_async(fallback)(
+                    request, *args, **kwargs
+                )
+            try:
+                credentials = await run_sync(
+                    authenticator.authenticate, request
+                )
+                request.user = (
+                    AnonymousUser() if credentials is None else credentials[0]
+                )
+                return await handler(request, *args, **kwargs)
+            except exceptions.APIException as error:
+                return render_error(error)
+
+        view.cls = fallback.cls
+        view.actions = fallback.actions
+        view.csrf_exempt = True
+        return view
+    return decorator
+
+
+def get_cached_response(namespace, request, get_data):
+    version, etag, last_modified = get_validators(namespace)
+    response = get_conditional_response(
+        request, etag=etag, last_modified=last_modified
+    )
+    if response is None:
+        key = get_cache_key(namespace, version, request)
+        response_cache = get_response_cache()
+        data = response_cache.get(key)
+        if data is None:
+            data = get_data()
+            response_cache.set(key, data, get_cache_timeout(namespace))
+        response = render(data)
+    return set_validators(response, etag, last_modified)
+
+
+@async_api_view(TagViewSet.as_view({'get': 'list'}))
+async def tag_list(request):
+    return await run_sync(
+        get_cached_response, 'tags', request,
+        lambda: TagSerializer(Tag.objects.all(), many=True).data
+    )
+
+
+@async_api_view(IngredientViewSet.as_view({'get': 'list'}))
+async def ingredient_list(request):
+    def get_data():
+        name = request.GET.get('name')
+        ingredients = (
+            Ingredient.objects.all() if name is None
+            else ingredient_index.search(name)
+        )
+        return IngredientSerializer(ingredients, many=True).data
+
+    return await run_sync(
+        get_cached_response, 'ingredients', request, get_data
+    )
+
+
+@async_api_view(RecipeViewSet.as_view({
+    'get': 'retrieve',
+    'put': 'update',
+    'patch': 'partial_update',
+    'delete': 'destroy',
+}))
+async def recipe_detail(request, pk):
+    context = {'request': request, 'image_variant': None}
+    user = request.user
+    if user.is_anonymous:
+        def get_data():
+            recipe = Recipe.objects.filter(pk=pk).first()
+            if recipe is None:
+                raise exceptions.NotFound()
+            return RecipeShortSerializer(recipe, context=context).data
+
+        return await run_sync(
+            get_cached_response, 'recipes', request, get_data
+        )
+
+    (
+        recipe, tags, amounts, is_favorited, is_in_shopping_cart,
+        is_subscribed
+    ) = await asyncio.gather(
+        run_sync(Recipe.objects.filter(pk=pk).select_related('author').first),
+        run_sync(list, Tag.objects.filter(recipes=pk)),
+        run_sync(list, IngredientAmount.objects.filter(
+            recipe=pk
+        ).select_related('ingredient')),
+        run_sync(Favorite.objects.filter(user=user, recipe=pk).exists),
+        run_sync(ShoppingCart.objects.filter(user=user, recipe=pk).exists),
+        run_sync(Follow.objects.filter(
+            user=user, author__recipes=pk
+        ).exists),
+    )
+    if recipe is None:
+        raise exceptions.NotFound()
+    recipe.is_favorited = is_favorited
+    recipe.is_in_shopping_cart = is_in_shopping_cart
+    set_prefetched(recipe, 'tags', tags)
+    set_prefetched(recipe, 'ingredient', amounts)
+    context['subscriptions'] = {recipe.author_id} if is_subscribed else set()
+    return render(RecipeReadSerializer(recipe, context=context).data)
+
+
+@async_api_view(UserViewSet.as_view({'get': 'subscriptions'}))
+async def subscriptions(request):
+    if request.user.is_anonymous:
+        raise exceptions.NotAuthenticated()
+    limit = get_recipes_limit(request)
+    authors = User.objects.filter(
+        following__user=request.user
+    ).order_by('id')
+    pagination = CustomPageNumberPagination()
+    page = await run_sync(
+        pagination.paginate_queryset, authors, Request(request)
+    )
+    authors = await run_sync(
+        with_limited_recipes, authors if page is None else page, limit
+    )
+    data = UserFollowSerializer(
+        authors, many=True, context={'request': request}
+    ).data
+    if page is None:
+        return render(data)
+    return render(pagination.get_paginated_response(data).data)
+
+
+urlpatterns = [
+    path('tags/', tag_list),
+    path('ingredients/', ingredient_list),
+    path('recipes/<int:pk>/', recipe_detail),
+    path('users/subscriptions/', subscriptions),
+]
@@ -0,0 +1,36 @@
+from hashlib import sha256
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.db import DEFAULT_DB_ALIAS
+from rest_framework.authentication import TokenAuthentication
+
+User = get_user_model()
+
+
+def get_token_cache_key(key):
+    return f'auth-token:{sha256(key.encode()).hexdigest()}'
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    user_fields = (
+        'id', 'username', 'email', 'first_name', 'last_name',
+        'is_active', 'is_staff', 'is_superuser',
+    )
+
+    def authenticate_credentials(self, key):
+        cache_key = get_token_cache_key(key)
+        values = cache.get(cache_key)
+        if values is not None:
+            user = User.from_db(
+                DEFAULT_DB_ALIAS, list(values), list(values.values())
+            )
+            return user, self.get_model()(key=key, user=user)
+        user, token = super().authenticate_credentials(key)
+        cache.set(cache_key, {
+            field.attname: getattr(user, field.attname)
+            for field in User._meta.concrete_fields
+            if field.attname in self.user_fields
+        }, settings.AUTH_TOKEN_CACHE_TIMEOUT)
+        return user, token
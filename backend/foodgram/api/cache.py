@@ -0,0 +1,94 @@
+import time
+from hashlib import md5
+
+from django.conf import settings
+from django.core.cache import cache, caches
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, urlencode
+from rest_framework.response import Response
+
+
+def get_version(namespace):
+    key = f'version:{namespace}'
+    version = cache.get(key)
+    if version is None:
+        cache.add(key, int(time.time() * 1000), None)
+        version = cache.get(key)
+    return version
+
+
+def bump_version(namespace):
+    key = f'version:{namespace}'
+    version = int(time.time() * 1000)
+    cache.set(key, max(version, (cache.get(key) or 0) + 1), None)
+
+
+def get_validators(namespace):
+    version = get_version(namespace)
+    return version, f'"{namespace}-{version}"', version // 1000
+
+
+def set_validators(response, etag, last_modified):
+    response['ETag'] = etag
+    response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, no_cache=True)
+    return response
+
+
+def get_cache_key(namespace, version, request):
+    query = urlencode(
+        sorted((key, sorted(values)) for key, values in request.GET.lists()),
+        doseq=True
+    )
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    return f'response:{namespace}:{version}:{md5(url.encode()).hexdigest()}'
+
+
+def get_response_cache():
+    return caches['responses']
+
+
+def get_cache_timeout(namespace):
+    return settings.API_CACHE_TIMEOUTS.get(
+        namespace, settings.API_CACHE_TIMEOUT
+    )
+
+
+class VersionedCacheMixin:
+    cache_namespace = None
+
+    def is_cacheable(self, request):
+        return True
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().list, request, *args, **kwargs
+        )
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached_response(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_cached_response(self, handler, request, *args, **kwargs):
+        if not self.is_cacheable(request):
+            return handler(request, *args, **kwargs)
+        version, etag, last_modified = get_validators(self.cache_namespace)
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            key = get_cache_key(self.cache_namespace, version, request)
+            response_cache = get_response_cache()
+            data = response_cache.get(key)
+            if data is not None:
+                response = Response(data)
+            else:
+                response = handler(request, *args, **kwargs)
+                if response.status_code != 200:
+                    return response
+                response_cache.set(
+                    key, response.data,
+                    get_cache_timeout(self.cache_namespace)
+                )
+        return set_validators(response, etag, last_modified)
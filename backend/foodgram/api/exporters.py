@@ -0,0 +1,65 @@
+import csv
+from io import BytesIO
+
+from django.conf import settings
+from reportlab.lib.pagesizes import A4
+from reportlab.pdfbase import pdfmetrics
+from reportlab.pdfbase.ttfonts import TTFont
+from reportlab.pdfgen import canvas
+
+TITLE = 'Список покупок'
+PDF_FONT = 'ShoppingCartFont'
+PDF_CHUNK_SIZE = 64 * 1024
+
+
+class Echo:
+    def write(self, value):
+        return value
+
+
+def shopping_cart_txt(ingredients):
+    yield f'{TITLE}\n\n'
+    for name, measurement_unit, amount in ingredients:
+        yield f'{name} {amount} {measurement_unit}\n'
+
+
+def shopping_cart_csv(ingredients):
+    writer = csv.writer(Echo())
+    yield writer.writerow(('Ингредиент', 'Количество', 'Единица измерения'))
+    for name, measurement_unit, amount in ingredients:
+        yield writer.writerow((name, amount, measurement_unit))
+
+
+def register_pdf_font():
+    if PDF_FONT not in pdfmetrics.getRegisteredFontNames():
+        pdfmetrics.registerFont(
+            TTFont(PDF_FONT, settings.SHOPPING_CART_PDF_FONT)
+        )
+
+
+def shopping_cart_pdf(ingredients):
+    register_pdf_font()
+    buffer = BytesIO()
+    page = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    y = height - 60
+    page.setFont(PDF_FONT, 18)
+    page.drawString(50, y, TITLE)
+    page.setFont(PDF_FONT, 12)
+    for name, measurement_unit, amount in ingredients:
+        y -= 20
+        if y < 50:
+            page.showPage()
+            page.setFont(PDF_FONT, 12)
+            y = height - 60
+        page.drawString(50, y, f'• {name} ({measurement_unit}) — {amount}')
+    page.save()
+    buffer.seek(0)
+    yield from iter(lambda: buffer.read(PDF_CHUNK_SIZE), b'')
+
+
+EXPORTERS = {
+    'txt': ('text/plain; charset=utf-8', shopping_cart_txt),
+    'csv': ('text/csv; charset=utf-8', shopping_cart_csv),
+    'pdf': ('application/pdf', shopping_cart_pdf),
+}
@@ -0,0 +1,158 @@
+import base64
+import binascii
+from tempfile import SpooledTemporaryFile
+from uuid import uuid4
+
+from django.conf import settings
+from django.core.exceptions import ValidationError as DjangoValidationError
+from django.core.files.uploadedfile import UploadedFile
+from drf_extra_fields.fields import Base64ImageField
+from PIL import Image
+from rest_framework import serializers
+from rest_framework.relations import MANY_RELATION_KWARGS
+
+from recipes.images import get_variants
+
+DECODE_CHUNK_SIZE = 64 * 1024
+SPOOL_SIZE = 1024 * 1024
+
+
+class BulkManyRelatedField(serializers.ManyRelatedField):
+    def to_internal_value(self, data):
+        if isinstance(data, str) or not hasattr(data, '__iter__'):
+            self.fail('not_a_list', input_type=type(data).__name__)
+        if not self.allow_empty and len(data) == 0:
+            self.fail('empty')
+        self.child_relation.resolve(data)
+        values, errors = [], []
+        for item in data:
+            try:
+                values.append(self.child_relation.to_internal_value(item))
+            except serializers.ValidationError as exc:
+                errors.extend(exc.detail)
+        if errors:
+            raise serializers.ValidationError(errors)
+        return values
+
+
+class BulkPrimaryKeyRelatedField(serializers.PrimaryKeyRelatedField):
+    def __init__(self, **kwargs):
+        super().__init__(**kwargs)
+        self.resolved = None
+
+    @classmethod
+    def many_init(cls, *args, **kwargs):
+        list_kwargs = {'child_relation': cls(*args, **kwargs)}
+        for key in kwargs:
+            if key in MANY_RELATION_KWARGS:
+                list_kwargs[key] = kwargs[key]
+        return BulkManyRelatedField(**list_kwargs)
+
+    def to_pk(self, data):
+        if isinstance(data, bool):
+            raise TypeError
+        return self.get_queryset().model._meta.pk.to_python(data)
+
+    def resolve(self, data):
+        pks = set()
+        for item in data:
+            try:
+                pks.add(self.to_pk(item))
+            except (TypeError, ValueError, DjangoValidationError):
+                continue
+        self.resolved = self.get_queryset().in_bulk(pks)
+
+    def to_internal_value(self, data):
+        if self.resolved is None:
+            return super().to_internal_value(data)
+        try:
+            pk = self.to_pk(data)
+        except (TypeError, ValueError, DjangoValidationError):
+            self.fail('incorrect_type', data_type=type(data).__name__)
+        if pk not in self.resolved:
+            self.fail('does_not_exist', pk_value=data)
+        return self.resolved[pk]
+
+
+class StreamingBase64ImageField(Base64ImageField):
+    default_error_messages = {
+        'max_size': 'Размер изображения не должен превышать {max_size} байт',
+    }
+
+    def __init__(self, max_size=None, **kwargs):
+        super().__init__(**kwargs)
+        self.max_size = max_size or settings.RECIPE_IMAGE_MAX_SIZE
+
+    def decode(self, data):
+        file = SpooledTemporaryFile(max_size=SPOOL_SIZE)
+        try:
+            for start in range(0, len(data), DECODE_CHUNK_SIZE):
+                file.write(base64.b64decode(
+                    data[start:start + DECODE_CHUNK_SIZE]
+                ))
+        except (binascii.Error, ValueError):
+            file.close()
+            raise serializers.ValidationError(self.INVALID_FILE_MESSAGE)
+        return file
+
+    def to_internal_value(self, base64_data):
+        if base64_data in self.EMPTY_VALUES:
+            return None
+        if not isinstance(base64_data, str):
+            return super().to_internal_value(base64_data)
+        data = base64_data.rpartition(';base64,')[2]
+        if len(data) // 4 * 3 > self.max_size + 2:
+            self.fail('max_size', max_size=self.max_size)
+        file = self.decode(data)
+        size = file.tell()
+        if size > self.max_size:
+            file.close()
+            self.fail('max_size', max_size=self.max_size)
+        try:
+            file.seek(0)
+            with Image.open(file) as image:
+                image_format = image.format
+                image.verify()
+        except Exception:
+            file.close()
+            self.fail('invalid_image')
+        extension = 'jpg' if image_format == 'JPEG' else image_format.lower()
+        if extension not in self.ALLOWED_TYPES:
+            file.close()
+            raise serializers.ValidationError(self.INVALID_TYPE_MESSAGE)
+        file.seek(0)
+        return UploadedFile(
+            file,
+            name=f'{uuid4()}.{extension}',
+            content_type=Image.MIME.get(image_format),
+            size=size
+        )
+
+
+class RecipeImageField(serializers.ImageField):
+    def __init__(self, variant=None, **kwargs):
+        kwargs['read_only'] = True
+        super().__init__(**kwargs)
+        self.variant = variant
+
+    def get_attribute(self, instance):
+        return instance
+
+    def build_url(self, url):
+        request = self.context.get('request')
+        return request.build_absolute_uri(url) if request else url
+
+    def to_representation(self, recipe):
+        variant = self.context.get('image_variant', self.variant)
+        name = get_variants(recipe).get(variant)
+        if name is None:
+            return super().to_representation(recipe.image)
+        return self.build_url(recipe.image.storage.url(name))
+
+
+class ImageVariantsField(RecipeImageField):
+    def to_representation(self, recipe):
+        return {
+            variant: self.build_url(recipe.image.storage.url(name))
+            for variant, name in get_variants(recipe).items()
+        }
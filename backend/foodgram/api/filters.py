@@ -1,17 +1,48 @@
 from django.contrib.auth import get_user_model
+from django.db.models import F
 from django_filters.rest_framework import filters, FilterSet
 
-from recipes.models import Ingredient, Recipe, Tag
+from recipes.models import Favorite, Recipe, ShoppingCart, Tag
 
 User = get_user_model()
 
 
-class IngredientFilter(FilterSet):
-    name = filters.CharFilter(lookup_expr='startswith')
+class RecipeOrderingFilter(filters.OrderingFilter):
+    rankings = {
+        'popular': 'rank__popular',
+        'trending': 'rank__trending',
+    }
+
+    def build_choices(self, fields, labels):
+        return super().build_choices(fields, labels) + [
+            ('popular', 'Популярные'),
+            ('trending', 'Набирают популярность'),
+        ]
+
+    def get_ordering_value(self, param):
+        if param in self.rankings:
+            return F(self.rankings[param]).desc(nulls_last=True)
+        return super().get_ordering_value(param)
+
+    def filter(self, qs, value):
+        if value and any(param in self.rankings for param in value):
+            value = [*value, '-pub_date']
+        return super().filter(qs, value)
+
+
+class UserOrderingFilter(filters.OrderingFilter):
+    def filter(self, qs, value):
+        return super().filter(qs, [*(value or ()), 'id'])
+
+
+class UserFilter(FilterSet):
+    ordering = UserOrderingFilter(
+        fields=('recipes_count', 'followers_count')
+    )
 
     class Meta:
-        model = Ingredient
-        fields = ('name',)
+        model = User
+        fields = ()
 
 
 class RecipeFilter(FilterSet):
@@ -19,11 +50,53 @@ class RecipeFilter(FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='filter_tags',
+    )
+    tags_mode = filters.ChoiceFilter(
+        choices=(('any', 'Любой из тегов'), ('all', 'Все теги')),
+        method='filter_tags_mode',
     )
 
-    is_favorited = filters.BooleanFilter()
-    is_in_shopping_cart = filters.BooleanFilter()
+    search = filters.CharFilter(method='filter_search')
+    is_favorited = filters.BooleanFilter(method='filter_user_recipes')
+    is_in_shopping_cart = filters.BooleanFilter(
+        method='filter_user_recipes'
+    )
+    ordering = RecipeOrderingFilter(
+        fields=('pub_date', 'favorites_count', 'carts_count')
+    )
 
     class Meta:
         model = Recipe
         fields = ('author',)
+
+    user_recipes = {
+        'is_favorited': Favorite,
+        'is_in_shopping_cart': ShoppingCart,
+    }
+
+    def filter_tags(self, queryset, name, value):
+        return queryset.with_tags(
+            {tag.pk for tag in value},
+            match_all=self.form.cleaned_data.get('tags_mode') == 'all'
+        )
+
+    def filter_tags_mode(self, queryset, name, value):
+        return queryset
+
+    def filter_user_recipes(self, queryset, name, value):
+        user = self.request.user
+        if user.is_anonymous:
+            return queryset.none() if value else queryset
+        recipes = self.user_recipes[name].objects.filter(
+            user=user
+        ).values('recipe_id')
+        if value:
+            return queryset.filter(pk__in=recipes)
+        return queryset.exclude(pk__in=recipes)
+
+    def filter_search(self, queryset, name, value):
+        value = value.strip()
+        if not value:
+            return queryset
+        return queryset.search(value)
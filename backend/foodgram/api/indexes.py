@@ -0,0 +1,46 @@
+from bisect import bisect_left
+from threading import Lock
+
+from recipes.models import Ingredient
+from .cache import get_version
+
+
+class IngredientIndex:
+    def __init__(self):
+        self.version = None
+        self.entries = ((), ())
+        self.lock = Lock()
+
+    def refresh(self):
+        version = get_version('ingredients')
+        if version == self.version:
+            return
+        with self.lock:
+            if version == self.version:
+                return
+            ingredients = sorted(
+                Ingredient.objects.all(),
+                key=lambda item: (item.name.casefold(), item.measurement_unit)
+            )
+            self.entries = (
+                tuple(item.name.casefold() for item in ingredients),
+                tuple(ingredients),
+            )
+            self.version = version
+
+    def search(self, name):
+        self.refresh()
+        keys, ingredients = self.entries
+        name = name.casefold()
+        start = bisect_left(keys, name)
+        end = start
+        while end < len(keys) and keys[end].startswith(name):
+            end += 1
+        contains = [
+            ingredient for key, ingredient in zip(keys, ingredients)
+            if name in key and not key.startswith(name)
+        ]
+        return list(ingredients[start:end]) + contains
+
+
+ingredient_index = IngredientIndex()
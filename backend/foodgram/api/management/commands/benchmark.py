@@ -0,0 +1,230 @@
+import base64
+import json
+import math
+import platform
+import random
+import time
+from contextlib import ExitStack
+from io import BytesIO
+from uuid import uuid4
+
+import django
+from django.contrib.auth import get_user_model
+from django.core.management import BaseCommand, CommandError
+from django.db import connection, connections
+from django.db.models import Count, Max, Min
+from django.test import Client, override_settings
+from PIL import Image
+from rest_framework.authtoken.models import Token
+
+from api.middleware import QueryCounter
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
+from users.models import Follow
+
+User = get_user_model()
+
+SCENARIOS = (
+    'recipe_list',
+    'recipe_detail',
+    'subscriptions',
+    'download_shopping_cart',
+    'ingredient_autocomplete',
+    'recipe_create',
+)
+RECIPE_POOL_SIZE = 5000
+
+
+def percentile(values, percent):
+    index = max(math.ceil(len(values) * percent / 100) - 1, 0)
+    return values[index]
+
+
+def summarize(values):
+    values = sorted(values)
+    return {
+        'min': round(values[0], 3),
+        'mean': round(sum(values) / len(values), 3),
+        'p50': round(percentile(values, 50), 3),
+        'p95': round(percentile(values, 95), 3),
+        'p99': round(percentile(values, 99), 3),
+        'max': round(values[-1], 3),
+    }
+
+
+class Command(BaseCommand):
+    help = 'Замеряет производительность основных эндпоинтов API'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--requests', type=int, default=200)
+        parser.add_argument('--warmup', type=int, default=20)
+        parser.add_argument(
+            '--scenario', action='append', choices=SCENARIOS, dest='scenarios'
+        )
+        parser.add_argument('--user')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--output')
+
+    def get_user(self, username):
+        if username:
+            user = User.objects.filter(username=username).first()
+        else:
+            user = User.objects.annotate(
+                follows=Count('follower')
+            ).order_by('-follows', 'pk').first()
+        if user is None:
+            raise CommandError(
+                'Пользователь не найден, сначала выполните generate_dataset'
+            )
+        return user
+
+    def prepare(self, user):
+        self.tags = list(Tag.objects.values_list('pk', 'slug'))
+        self.ingredients = list(Ingredient.objects.values_list('pk', 'name'))
+        bounds = Recipe.objects.aggregate(low=Min('pk'), high=Max('pk'))
+        if not self.tags or not self.ingredients or bounds['low'] is None:
+            raise CommandError(
+                'В базе нет рецептов, тегов или ингредиентов, '
+                'сначала выполните generate_dataset'
+            )
+        candidates = range(bounds['low'], bounds['high'] + 1)
+        self.recipes = list(Recipe.objects.filter(pk__in=self.rng.sample(
+            candidates, min(RECIPE_POOL_SIZE, len(candidates))
+        )).values_list('pk', flat=True))
+        buffer = BytesIO()
+        Image.new('RGB', (800, 600), (90, 160, 60)).save(buffer, 'JPEG')
+        self.image = 'data:image/jpeg;base64,' + base64.b64encode(
+            buffer.getvalue()
+        ).decode()
+        token, _ = Token.objects.get_or_create(user=user)
+        self.client = Client(HTTP_AUTHORIZATION=f'Token {token.key}')
+        self.created = []
+
+    def request_recipe_list(self):
+        slugs = self.rng.sample(
+            [slug for _, slug in self.tags],
+            self.rng.randint(1, min(2, len(self.tags)))
+        )
+        query = '&'.join(f'tags={slug}' for slug in slugs)
+        if self.rng.random() < 0.2:
+            return 'get', f'/api/recipes/?limit=6&is_favorited=1&{query}', {}
+        page = self.rng.randint(1, 5)
+        return 'get', f'/api/recipes/?limit=6&page={page}&{query}', {}
+
+    def request_recipe_detail(self):
+        return 'get', f'/api/recipes/{self.rng.choice(self.recipes)}/', {}
+
+    def request_subscriptions(self):
+        return 'get', '/api/users/subscriptions/?limit=6&recipes_limit=3', {}
+
+    def request_download_shopping_cart(self):
+        return 'get', '/api/recipes/download_shopping_cart/', {}
+
+    def request_ingredient_autocomplete(self):
+        _, name = self.rng.choice(self.ingredients)
+        prefix = name[:self.rng.randint(1, 3)].lower()
+        return 'get', '/api/ingredients/', {'data': {'name': prefix}}
+
+    def request_recipe_create(self):
+        ingredients = self.rng.sample(
+            self.ingredients, min(8, len(self.ingredients))
+        )
+        payload = {
+            'name': f'Бенчмарк {uuid4().hex[:12]}',
+            'text': 'Рецепт, созданный нагрузочным тестом',
+            'cooking_time': self.rng.randint(5, 180),
+            'image': self.image,
+            'tags': [self.rng.choice(self.tags)[0]],
+            'ingredients': [
+                {'id': pk, 'amount': self.rng.randint(1, 500)}
+                for pk, _ in ingredients
+            ],
+        }
+        return 'post', '/api/recipes/', {
+            'data': json.dumps(payload),
+            'content_type': 'application/json',
+        }
+
+    def send(self, method, url, kwargs):
+        counter = QueryCounter()
+        with ExitStack() as stack:
+            for database in connections.all():
+                stack.enter_context(database.execute_wrapper(counter))
+            started = time.perf_counter()
+            response = getattr(self.client, method)(url, **kwargs)
+            if response.streaming:
+                b''.join(response.streaming_content)
+            elapsed = time.perf_counter() - started
+        if method == 'post' and response.status_code == 201:
+            self.created.append(response.json()['id'])
+        return response.status_code, elapsed, counter.count
+
+    def run_scenario(self, name, requests, warmup):
+        build = getattr(self, f'request_{name}')
+        for _ in range(warmup):
+            self.send(*build())
+        latencies, queries, errors = [], [], 0
+        started = time.perf_counter()
+        for _ in range(requests):
+            status, elapsed, count = self.send(*build())
+            errors += status >= 400
+            latencies.append(elapsed * 1000)
+            queries.append(count)
+        duration = time.perf_counter() - started
+        return {
+            'requests': requests,
+            'errors': errors,
+            'throughput_rps': round(requests / duration, 2),
+            'latency_ms': summarize(latencies),
+            'queries': summarize(queries),
+        }
+
+    def cleanup(self):
+        for recipe in Recipe.objects.filter(pk__in=self.created):
+            image = recipe.image
+            recipe.delete()
+            image.storage.delete(image.name)
+
+    def handle(self, *args, **options):
+        if options['requests'] < 1:
+            raise CommandError('--requests должен быть больше нуля')
+        self.rng = random.Random(options['seed'])
+        user = self.get_user(options['user'])
+        self.prepare(user)
+        report = {
+            'database': connection.vendor,
+            'django': django.get_version(),
+            'python': platform.python_version(),
+            'seed': options['seed'],
+            'user': user.username,
+            'dataset': {
+                'users': User.objects.count(),
+                'recipes': Recipe.objects.count(),
+                'tags': len(self.tags),
+                'ingredients': len(self.ingredients),
+                'ingredient_amounts': IngredientAmount.objects.count(),
+                'follows': Follow.objects.count(),
+                'favorites': Favorite.objects.count(),
+                'carts': ShoppingCart.objects.count(),
+            },
+            'scenarios': {},
+        }
+        with override_settings(
+            DEBUG=False,
+            REQUEST_METRICS_SAMPLE_RATE=0,
+            QUERY_BUDGETS_ENFORCE=False,
+            RECIPE_IMAGE_WORKERS=0,
+        ):
+            try:
+                for name in options['scenarios'] or SCENARIOS:
+                    report['scenarios'][name] = self.run_scenario(
+                        name, options['requests'], options['warmup']
+                    )
+            finally:
+                self.cleanup()
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options['output']:
+            with open(options['output'], 'w', encoding='utf-8') as file:
+                file.write(output + '\n')
+        else:
+            self.stdout.write(output)
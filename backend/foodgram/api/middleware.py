@@ -0,0 +1,240 @@
+import asyncio
+import json
+import logging
+import random
+import time
+from contextvars import ContextVar
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from rest_framework.permissions import SAFE_METHODS
+
+from .routers import is_pinned_to_primary, pin_to_primary, use_replica
+
+logger = logging.getLogger('api.metrics')
+
+current_counter = ContextVar('current_counter', default=None)
+current_serializer_timer = ContextVar('current_serializer_timer', default=None)
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+TRANSACTION_STATEMENTS = (
+    'SAVEPOINT', 'RELEASE SAVEPOINT', 'ROLLBACK TO SAVEPOINT',
+)
+
+
+class QueryCounter:
+    def __init__(self):
+        self.count = 0
+        self.connects = 0
+        self.duration = 0.0
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            if not sql.startswith(TRANSACTION_STATEMENTS):
+                self.count += 1
+            self.duration += time.perf_counter() - started
+
+
+class SerializerTimer:
+    def __init__(self, counter):
+        self.counter = counter
+        self.duration = 0.0
+        self.active = False
+
+    def __call__(self, to_representation, instance):
+        if self.active:
+            return to_representation(instance)
+        self.active = True
+        started, db_duration = time.perf_counter(), self.counter.duration
+        try:
+            return to_representation(instance)
+        finally:
+            self.active = False
+            self.duration += (
+                time.perf_counter() - started
+                - (self.counter.duration - db_duration)
+            )
+
+
+def count_queries(execute, sql, params, many, context):
+    counter = current_counter.get()
+    if counter is None:
+        return execute(sql, params, many, context)
+    return counter(execute, sql, params, many, context)
+
+
+def measure_representation(to_representation, instance):
+    timer = current_serializer_timer.get()
+    if timer is None:
+        return to_representation(instance)
+    return timer(to_representation, instance)
+
+
+def get_view_budget(view_func, method):
+    view_class = getattr(view_func, 'cls', None)
+    actions = getattr(view_func, 'actions', None) or {}
+    action = actions.get(method.lower(), method.lower())
+    if view_class is None:
+        return view_func.__name__, None
+    budgets = getattr(view_class, 'query_budgets', {})
+    return f'{view_class.__name__}.{action}', budgets.get(action)
+
+
+class HybridMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if asyncio.iscoroutinefunction(get_response):
+            self._is_coroutine = asyncio.coroutines._is_coroutine
+
+
+class RequestMetricsMiddleware(HybridMiddleware):
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return self.get_response(request)
+        counter, timer, tokens = self.start(request)
+        try:
+            response = self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, counter, timer)
+
+    async def __acall__(self, request):
+        if random.random() >= settings.REQUEST_METRICS_SAMPLE_RATE:
+            return await self.get_response(request)
+        counter, timer, tokens = self.start(request)
+        try:
+            response = await self.get_response(request)
+        finally:
+            self.stop(tokens)
+        return self.finish(request, response, counter, timer)
+
+    def start(self, request):
+        request.metrics = {'view': None, 'budget': None}
+        request.metrics_timings = {'started': time.perf_counter()}
+        counter = QueryCounter()
+        timer = SerializerTimer(counter)
+        return counter, timer, (
+            current_counter.set(counter),
+            current_serializer_timer.set(timer),
+        )
+
+    def stop(self, tokens):
+        counter_token, timer_token = tokens
+        current_counter.reset(counter_token)
+        current_serializer_timer.reset(timer_token)
+
+    def finish(self, request, response, counter, timer):
+        finished = time.perf_counter()
+        timings = request.metrics_timings
+        started = timings['started']
+        view = timings.get('view_finished', finished) - timings.get(
+            'view_started', started
+        )
+        render = timings.get('rendered', finished) - timings.get(
+            'view_finished', finished
+        )
+        metrics = request.metrics
+        metrics.update(
+            method=request.method,
+            path=request.path,
+            status=response.status_code,
+            queries=counter.count,
+            db_connects=counter.connects,
+            db_reused=counter.count > 0 and not counter.connects,
+            db_ms=round(counter.duration * 1000, 2),
+            serializer_ms=round(timer.duration * 1000, 2),
+            app_ms=round(
+                max(view - counter.duration - timer.duration, 0) * 1000, 2
+            ),
+            render_ms=round(render * 1000, 2),
+            total_ms=round((finished - started) * 1000, 2),
+            size=None if response.streaming else len(response.content),
+        )
+        response['Server-Timing'] = (
+            f'db;dur={metrics["db_ms"]};desc="{counter.count} queries", '
+            f'serializer;dur={metrics["serializer_ms"]}, '
+            f'app;dur={metrics["app_ms"]}, '
+            f'render;dur={metrics["render_ms"]}, '
+            f'total;dur={metrics["total_ms"]}'
+        )
+        over_budget = (
+            metrics['budget'] is not None
+            and counter.count > metrics['budget']
+        )
+        logger.log(
+            logging.WARNING if over_budget else logging.INFO,
+            json.dumps(metrics, ensure_ascii=False)
+        )
+        if over_budget and settings.QUERY_BUDGETS_ENFORCE:
+            raise QueryBudgetExceeded(
+                f'{metrics["view"]}: {counter.count} запросов к БД '
+                f'при бюджете {metrics["budget"]}'
+            )
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        if hasattr(request, 'metrics'):
+            request.metrics['view'], request.metrics['budget'] = (
+                get_view_budget(view_func, request.method)
+            )
+            request.metrics_timings['view_started'] = time.perf_counter()
+
+    def process_template_response(self, request, response):
+        if hasattr(request, 'metrics'):
+            timings = request.metrics_timings
+            timings['view_finished'] = time.perf_counter()
+            response.add_post_render_callback(
+                lambda response: timings.update(rendered=time.perf_counter())
+            )
+        return response
+
+
+class ReplicaMiddleware(HybridMiddleware):
+    def __call__(self, request):
+        if asyncio.iscoroutinefunction(self.get_response):
+            return self.__acall__(request)
+        if not settings.DB_REPLICAS:
+            return self.get_response(request)
+        token = use_replica.set(None)
+        try:
+            response = self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        if request.method not in SAFE_METHODS:
+            pin_to_primary(request)
+        return response
+
+    async def __acall__(self, request):
+        if not settings.DB_REPLICAS:
+            return await self.get_response(request)
+        token = use_replica.set(None)
+        try:
+            response = await self.get_response(request)
+        finally:
+            use_replica.reset(token)
+        if request.method not in SAFE_METHODS:
+            await sync_to_async(pin_to_primary)(request)
+        return response
+
+    def process_view(self, request, view_func, view_args, view_kwargs):
+        view_class = getattr(view_func, 'cls', None)
+        if (
+            settings.DB_REPLICAS
+            and request.method in SAFE_METHODS
+            and view_class is not None
+            and view_class.__module__.startswith('api.')
+            and not is_pinned_to_primary(request)
+        ):
+            use_replica.set(random.choice(settings.DB_REPLICAS))
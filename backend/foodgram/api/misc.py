@@ -1,9 +1,23 @@
 from django.shortcuts import get_object_or_404
-from rest_framework import status
+from rest_framework import serializers, status
 from rest_framework.response import Response
 
 from recipes.models import Recipe
 
+RECIPES_LIMIT = 6
+
+
+def get_recipes_limit(request):
+    try:
+        limit = int(request.GET.get('recipes_limit', RECIPES_LIMIT))
+    except ValueError:
+        limit = -1
+    if limit < 0:
+        raise serializers.ValidationError(
+            {'recipes_limit': ['Укажите целое неотрицательное число.']}
+        )
+    return limit
+
 
 def recipe_m2m_create_delete(request, pk, model, serializer):
     recipe = get_object_or_404(Recipe, id=pk)
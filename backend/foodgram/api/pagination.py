@@ -1,5 +1,51 @@
-from rest_framework.pagination import PageNumberPagination
+from rest_framework.exceptions import ValidationError
+from rest_framework.pagination import CursorPagination, PageNumberPagination
+
+MAX_PAGE_SIZE = 100
 
 
 class CustomPageNumberPagination(PageNumberPagination):
     page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+
+
+class RecipeCursorPagination(CursorPagination):
+    page_size = 6
+    page_size_query_param = 'limit'
+    max_page_size = MAX_PAGE_SIZE
+    ordering = ('-pub_date', '-id')
+
+
+class RecipePagination(CustomPageNumberPagination):
+    mode_query_param = 'pagination'
+    cursor_incompatible_params = ('ordering', 'search')
+
+    def __init__(self):
+        self.cursor_pagination = RecipeCursorPagination()
+        self.use_cursor = False
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.use_cursor = (
+            request.query_params.get(self.mode_query_param) == 'cursor'
+            or self.cursor_pagination.cursor_query_param
+            in request.query_params
+        )
+        if self.use_cursor:
+            params = [
+                param for param in self.cursor_incompatible_params
+                if request.query_params.get(param)
+            ]
+            if params:
+                raise ValidationError({param: [
+                    'Курсорная пагинация сортирует только по дате '
+                    'публикации и не сочетается с этим параметром.'
+                ] for param in params})
+            return self.cursor_pagination.paginate_queryset(
+                queryset, request, view
+            )
+        return super().paginate_queryset(queryset, request, view)
+
+    def get_paginated_response(self, data):
+        if self.use_cursor:
+            return self.cursor_pagination.get_paginated_response(data)
+        return super().get_paginated_response(data)
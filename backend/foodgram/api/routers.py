@@ -0,0 +1,55 @@
+from contextvars import ContextVar
+from hashlib import sha256
+
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import DEFAULT_DB_ALIAS
+
+from .checks import PROCESS_LOCAL_CACHES
+
+PRIMARY_APPS = {'authtoken', 'sessions', 'admin', 'contenttypes'}
+
+use_replica = ContextVar('use_replica', default=None)
+
+
+def get_pin_key(request):
+    client = request.META.get('HTTP_AUTHORIZATION') or request.META.get(
+        'HTTP_X_REAL_IP', request.META.get('REMOTE_ADDR', '')
+    )
+    return 'replica-pin:' + sha256(client.encode()).hexdigest()
+
+
+def pin_to_primary(request):
+    cache.set(get_pin_key(request), True, settings.DB_REPLICA_PIN_SECONDS)
+
+
+def is_pinned_to_primary(request):
+    return cache.get(get_pin_key(request), False)
+
+
+class ReplicaRouter:
+    def __init__(self):
+        if (
+            settings.DB_REPLICAS
+            and settings.CACHES['default']['BACKEND'] in PROCESS_LOCAL_CACHES
+        ):
+            raise ImproperlyConfigured(
+                'Для DB_REPLICA_HOSTS нужен общий CACHE_BACKEND: отметки '
+                'чтения из основной БД должны быть видны всем воркерам.'
+            )
+
+    def db_for_read(self, model, **hints):
+        replica = use_replica.get()
+        if replica is not None and model._meta.app_label not in PRIMARY_APPS:
+            return replica
+        return DEFAULT_DB_ALIAS
+
+    def db_for_write(self, model, **hints):
+        return DEFAULT_DB_ALIAS
+
+    def allow_relation(self, obj1, obj2, **hints):
+        return True
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        return db == DEFAULT_DB_ALIAS
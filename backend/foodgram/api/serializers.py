@@ -1,20 +1,35 @@
 from django.contrib.auth import get_user_model
-from django.db.models import F
-from drf_extra_fields.fields import Base64ImageField
+from django.db import IntegrityError, transaction
 from rest_framework import serializers
 from rest_framework.fields import SerializerMethodField
+from rest_framework.settings import api_settings
 from rest_framework.validators import UniqueTogetherValidator
 
 from recipes.models import (
     Favorite, Ingredient, IngredientAmount, Recipe,
-    ShoppingCart, Tag
+    ShoppingCart, Tag, get_tags_mask
 )
 from users.models import Follow
+from .cache import bump_version
+from .fields import (BulkPrimaryKeyRelatedField, ImageVariantsField,
+                     RecipeImageField, StreamingBase64ImageField)
+from .middleware import measure_representation
+from .misc import get_recipes_limit
 
 User = get_user_model()
 
+DUPLICATE_RECIPE_MESSAGE = 'У вас уже есть рецепт с таким названием'
 
-class UserSerializer(serializers.ModelSerializer):
+AUTHOR_COUNTERS = {'recipes_count', 'followers_count'}
+
+
+class TimedRepresentationMixin:
+    def to_representation(self, instance):
+        return measure_representation(super().to_representation, instance)
+
+
+class UserSerializer(TimedRepresentationMixin,
+                     serializers.ModelSerializer):
     is_subscribed = SerializerMethodField()
 
     class Meta:
@@ -27,6 +42,8 @@ class UserSerializer(serializers.ModelSerializer):
             'last_name',
             'email',
             'is_subscribed',
+            'recipes_count',
+            'followers_count',
         )
         read_only_fields = ('is_subscribed',)
         extra_kwargs = {
@@ -37,7 +54,11 @@ class UserSerializer(serializers.ModelSerializer):
         current_user = self.context['request'].user
         if current_user.is_anonymous or current_user == author:
             return False
-        return current_user.follower.filter(author=author).exists()
+        if 'subscriptions' not in self.context:
+            self.context['subscriptions'] = set(
+                current_user.follower.values_list('author_id', flat=True)
+            )
+        return author.id in self.context['subscriptions']
 
     def create(self, validated_data):
         return User.objects.create_user(
@@ -49,7 +70,10 @@ class UserSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeShortSerializer(serializers.ModelSerializer):
+class RecipeShortSerializer(TimedRepresentationMixin,
+                            serializers.ModelSerializer):
+    image = RecipeImageField(variant='thumbnail')
+
     class Meta:
         model = Recipe
         fields = (
@@ -62,9 +86,9 @@ class RecipeShortSerializer(serializers.ModelSerializer):
         read_only_fields = ('__all__',)
 
 
-class UserFollowSerializer(serializers.ModelSerializer):
+class UserFollowSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     recipes = SerializerMethodField()
-    recipes_count = SerializerMethodField()
     is_subscribed = SerializerMethodField()
 
     class Meta:
@@ -90,22 +114,21 @@ class UserFollowSerializer(serializers.ModelSerializer):
             'recipes_count',
         )
 
-    def get_recipes_count(self, author):
-        return author.recipes.count()
-
     def get_is_subscribed(self, author):
-        current_user = self.context['request'].user
-        return current_user.follower.filter(author=author).exists()
+        return True
 
     def get_recipes(self, author):
-        request = self.context['request']
-        limit = request.GET.get('recipes_limit', 6)
-        recipes = author.recipes.all()[:int(limit)]
+        if hasattr(author, 'limited_recipes'):
+            recipes = author.limited_recipes
+        else:
+            limit = get_recipes_limit(self.context['request'])
+            recipes = author.recipes.all()[:limit]
         serializer = RecipeShortSerializer(recipes, many=True, read_only=True)
         return serializer.data
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(TimedRepresentationMixin,
+                    serializers.ModelSerializer):
     class Meta:
         model = Tag
         fields = (
@@ -116,7 +139,8 @@ class TagSerializer(serializers.ModelSerializer):
         )
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     class Meta:
         model = Ingredient
         fields = (
@@ -126,26 +150,48 @@ class IngredientSerializer(serializers.ModelSerializer):
         )
 
 
-class RecipeReadSerializer(serializers.ModelSerializer):
+class IngredientAmountReadSerializer(serializers.ModelSerializer):
+    id = serializers.ReadOnlyField(source='ingredient.id')
+    name = serializers.ReadOnlyField(source='ingredient.name')
+    measurement_unit = serializers.ReadOnlyField(
+        source='ingredient.measurement_unit'
+    )
+
+    class Meta:
+        model = IngredientAmount
+        fields = ('id', 'name', 'measurement_unit', 'amount')
+
+
+class RecipeReadSerializer(TimedRepresentationMixin,
+                           serializers.ModelSerializer):
     tags = TagSerializer(many=True, read_only=True)
-    ingredients = SerializerMethodField()
+    ingredients = IngredientAmountReadSerializer(
+        source='ingredient',
+        many=True,
+        read_only=True
+    )
     is_favorited = serializers.BooleanField()
     is_in_shopping_cart = serializers.BooleanField()
     author = UserSerializer(read_only=True)
+    image = RecipeImageField()
+    image_variants = ImageVariantsField()
 
     class Meta:
         model = Recipe
-        exclude = ('pub_date',)
+        exclude = ('pub_date', 'search_vector', 'tags_mask')
 
-    def get_ingredients(self, recipe):
-        ingredients = recipe.ingredients.values(
-            'id', 'name', 'measurement_unit', amount=F('recipe__amount')
-        )
-        return ingredients
+
+class IngredientAmountListSerializer(serializers.ListSerializer):
+    def to_internal_value(self, data):
+        if isinstance(data, list):
+            self.child.fields['id'].resolve(
+                item.get('id') for item in data if isinstance(item, dict)
+            )
+        return super().to_internal_value(data)
 
 
 class IngredientAmountSerializer(serializers.ModelSerializer):
-    id = serializers.PrimaryKeyRelatedField(
+    id = BulkPrimaryKeyRelatedField(
         queryset=Ingredient.objects.all(),
         source='ingredient'
     )
@@ -153,12 +199,13 @@ class IngredientAmountSerializer(serializers.ModelSerializer):
     class Meta:
         model = IngredientAmount
         fields = ('id', 'amount')
+        list_serializer_class = IngredientAmountListSerializer
 
 
 class RecipeWriteSerializer(RecipeReadSerializer):
-    image = Base64ImageField()
+    image = StreamingBase64ImageField()
     ingredients = IngredientAmountSerializer(many=True)
-    tags = serializers.PrimaryKeyRelatedField(
+    tags = BulkPrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
 
@@ -168,62 +215,134 @@ class RecipeWriteSerializer(RecipeReadSerializer):
                   'text', 'cooking_time')
 
     def validate(self, data):
-        request = self.context.get('request')
-        ingredients = self.initial_data.get('ingredients')
+        ingredients = self.initial_data.get('ingredients', [])
         ingredients = [ingredient['id'] for ingredient in ingredients]
         if len(ingredients) != len(set(ingredients)):
             raise serializers.ValidationError(
                 'Ингредиенты должны быть в одном экземпляре'
             )
-        if request.method == 'POST' and Recipe.objects.filter(
-            author=request.user,
-            name=self.initial_data.get('name')
-        ).exists():
-            raise serializers.ValidationError(
-                'У вас уже есть рецепт с таким названием'
-            )
         return data
 
     def create_ingredients(self, ingredients, recipe):
-        IngredientAmount.objects.bulk_create([IngredientAmount(
+        return IngredientAmount.objects.bulk_create([IngredientAmount(
             ingredient=ingredient['ingredient'],
             recipe=recipe,
             amount=ingredient['amount']
         ) for ingredient in ingredients])
 
+    def is_duplicate(self, author, name, pk=None):
+        return name is not None and Recipe.objects.filter(
+            author=author, name=name
+        ).exclude(pk=pk).exists()
+
     def create(self, validated_data):
         ingredients = validated_data.pop('ingredients')
         tags = validated_data.pop('tags')
         current_user = self.context.get('request').user
-        recipe = Recipe.objects.create(author=current_user, **validated_data)
-        recipe.tags.set(tags)
-        self.create_ingredients(ingredients, recipe)
-        recipe.save()
+        try:
+            with transaction.atomic():
+                recipe = Recipe.objects.create(
+                    author=current_user,
+                    tags_mask=get_tags_mask(tag.id for tag in tags),
+                    **validated_data
+                )
+                Recipe.tags.through.objects.bulk_create([
+                    Recipe.tags.through(recipe=recipe, tag=tag)
+                    for tag in tags
+                ])
+                amounts = self.create_ingredients(ingredients, recipe)
+                transaction.on_commit(lambda: bump_version('recipes'))
+        except IntegrityError:
+            if not self.is_duplicate(current_user, validated_data['name']):
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_RECIPE_MESSAGE]
+            })
+        counters = current_user.get_deferred_fields() & AUTHOR_COUNTERS
+        if counters:
+            current_user.refresh_from_db(fields=counters)
+        self.related = {'tags': tags, 'ingredient': amounts}
         return recipe
 
+    def update_ingredients(self, ingredients, recipe):
+        current = {
+            amount.ingredient_id: amount for amount in recipe.ingredient.all()
+        }
+        new = {
+            ingredient['ingredient'].id: ingredient
+            for ingredient in ingredients
+        }
+        removed = current.keys() - new.keys()
+        if removed:
+            IngredientAmount.objects.filter(
+                recipe=recipe,
+                ingredient_id__in=removed
+            ).delete()
+        changed, created = [], []
+        for ingredient_id, ingredient in new.items():
+            amount = current.get(ingredient_id)
+            if amount is None:
+                created.append(IngredientAmount(
+                    ingredient=ingredient['ingredient'],
+                    recipe=recipe,
+                    amount=ingredient['amount']
+                ))
+            elif amount.amount != ingredient['amount']:
+                amount.amount = ingredient['amount']
+                changed.append(amount)
+        if changed:
+            IngredientAmount.objects.bulk_update(changed, ('amount',))
+        if created:
+            IngredientAmount.objects.bulk_create(created)
+        return [
+            amount for ingredient_id, amount in current.items()
+            if ingredient_id not in removed
+        ] + created
+
     def update(self, instance, validated_data):
-        ingredients = validated_data.pop('ingredients')
-        IngredientAmount.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
-        return super().update(instance, validated_data)
+        ingredients = validated_data.pop('ingredients', None)
+        tags = validated_data.pop('tags', None)
+        self.related = {
+            'tags': list(instance.tags.all()),
+            'ingredient': list(instance.ingredient.all()),
+        }
+        try:
+            with transaction.atomic():
+                if ingredients is not None:
+                    self.related['ingredient'] = self.update_ingredients(
+                        ingredients, instance
+                    )
+                if tags is not None:
+                    instance.tags.set(tags)
+                    self.related['tags'] = tags
+                changed = [
+                    field for field, value in validated_data.items()
+                    if getattr(instance, field) != value
+                ]
+                for field in changed:
+                    setattr(instance, field, validated_data[field])
+                if changed:
+                    instance.save(update_fields=changed)
+                transaction.on_commit(lambda: bump_version('recipes'))
+        except IntegrityError:
+            if not self.is_duplicate(
+                instance.author_id, validated_data.get('name'), instance.pk
+            ):
+                raise
+            raise serializers.ValidationError({
+                api_settings.NON_FIELD_ERRORS_KEY: [DUPLICATE_RECIPE_MESSAGE]
+            })
+        return instance
 
     def to_representation(self, instance):
-        user = self.context['request'].user
-        is_favorited = Favorite.objects.filter(
-            user=user,
-            recipe=instance
-        ).exists()
-        is_in_shopping_cart = ShoppingCart.objects.filter(
-            user=user,
-            recipe=instance
-        ).exists()
-        setattr(instance, 'is_favorited', is_favorited)
-        setattr(instance, 'is_in_shopping_cart', is_in_shopping_cart)
-        serializer = RecipeReadSerializer(
-            instance,
-            context={'request': self.context.get('request')}
-        )
-        return serializer.data
+        if hasattr(self, 'related'):
+            if not hasattr(instance, '_prefetched_objects_cache'):
+                instance._prefetched_objects_cache = {}
+            instance._prefetched_objects_cache.update(self.related)
+        for flag in ('is_favorited', 'is_in_shopping_cart'):
+            if not hasattr(instance, flag):
+                setattr(instance, flag, False)
+        return RecipeReadSerializer(instance, context=self.context).data
 
 
 class FavoriteSerializer(serializers.ModelSerializer):
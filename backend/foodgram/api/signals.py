@@ -0,0 +1,94 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.signals import request_started
+from django.db import connections, transaction
+from django.db.backends.signals import connection_created
+from django.db.models.signals import m2m_changed, post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from recipes.models import Ingredient, IngredientAmount, Recipe, Tag
+from .authentication import get_token_cache_key
+from .cache import bump_version
+from .middleware import count_queries, current_counter
+
+User = get_user_model()
+
+
+def bump_version_on_commit(namespace):
+    transaction.on_commit(lambda: bump_version(namespace))
+
+
+def bump_recipes_version():
+    bump_version_on_commit('recipes')
+
+
+@receiver((post_save, post_delete), sender=Tag)
+def tags_changed(**kwargs):
+    bump_version_on_commit('tags')
+    bump_recipes_version()
+
+
+@receiver((post_save, post_delete), sender=Ingredient)
+def ingredients_changed(**kwargs):
+    bump_version_on_commit('ingredients')
+    bump_recipes_version()
+
+
+@receiver((post_save, post_delete), sender=Recipe)
+@receiver((post_save, post_delete), sender=IngredientAmount)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def recipes_changed(**kwargs):
+    bump_recipes_version()
+
+
+@receiver(post_delete, sender=Token)
+def token_deleted(instance, **kwargs):
+    cache.delete(get_token_cache_key(instance.key))
+
+
+@receiver(post_save, sender=User)
+def user_changed(instance, **kwargs):
+    cache.delete_many([
+        get_token_cache_key(key)
+        for key in Token.objects.filter(user=instance).values_list(
+            'key', flat=True
+        )
+    ])
+
+
+def check_health_on_first_use(connection):
+    get_cursor = connection._cursor
+
+    def _cursor(*args, **kwargs):
+        if connection.connection is not None and not getattr(
+            connection, 'health_check_done', True
+        ):
+            if not connection.is_usable():
+                connection.close()
+            connection.health_check_done = True
+        return get_cursor(*args, **kwargs)
+
+    connection._cursor = _cursor
+    connection.health_check_wrapped = True
+
+
+@receiver(request_started)
+def reset_health_checks(**kwargs):
+    for connection in connections.all():
+        if getattr(connection, 'health_check_wrapped', False):
+            connection.health_check_done = False
+
+
+@receiver(connection_created)
+def instrument_connection(connection, **kwargs):
+    if count_queries not in connection.execute_wrappers:
+        connection.execute_wrappers.append(count_queries)
+    connection.health_check_done = True
+    if connection.settings_dict.get('CONN_HEALTH_CHECKS') and not getattr(
+        connection, 'health_check_wrapped', False
+    ):
+        check_health_on_first_use(connection)
+    counter = current_counter.get()
+    if counter is not None:
+        counter.connects += 1
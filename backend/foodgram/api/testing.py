@@ -0,0 +1,26 @@
+import logging
+
+from django.test import override_settings
+from django.test.runner import DiscoverRunner
+
+enforce_query_budgets = override_settings(
+    REQUEST_METRICS_SAMPLE_RATE=1.0,
+    QUERY_BUDGETS_ENFORCE=True,
+)
+
+
+def get_request_metrics(response):
+    request = getattr(response, 'wsgi_request', None) or getattr(
+        response, 'asgi_request', None
+    )
+    return getattr(request, 'metrics', None)
+
+
+class TestRunner(DiscoverRunner):
+    def setup_test_environment(self, **kwargs):
+        super().setup_test_environment(**kwargs)
+        logging.getLogger('api.metrics').disabled = True
+
+    def teardown_test_environment(self, **kwargs):
+        logging.getLogger('api.metrics').disabled = False
+        super().teardown_test_environment(**kwargs)
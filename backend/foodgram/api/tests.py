@@ -0,0 +1,839 @@
+import base64
+import csv
+import json
+import os
+import shutil
+import tempfile
+import time
+from io import BytesIO, StringIO
+from unittest import mock
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.core.cache import cache, caches
+from django.core.files.base import ContentFile
+from django.db import (DEFAULT_DB_ALIAS, DatabaseError, IntegrityError,
+                       connection, connections, transaction)
+from django.db.models.signals import post_delete
+from asgiref.sync import async_to_sync
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import include, path
+from django.utils.http import urlencode
+from PIL import Image
+from rest_framework.authtoken.models import Token
+from rest_framework.exceptions import ValidationError
+from rest_framework.test import APIClient
+
+from recipes.images import VARIANTS, build_variants, get_variants
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag, get_tags_mask)
+from users.models import Follow
+from . import async_views, urls
+from .cache import get_version
+from .fields import StreamingBase64ImageField
+from .pagination import RecipePagination
+from .serializers import DUPLICATE_RECIPE_MESSAGE
+from .testing import enforce_query_budgets, get_request_metrics
+
+User = get_user_model()
+
+MEDIA_ROOT = tempfile.mkdtemp()
+
+urlpatterns = [
+    path('api/', include(async_views.urlpatterns + urls.urlpatterns)),
+]
+
+
+def get_image_bytes(size=(32, 24), image_format='PNG'):
+    buffer = BytesIO()
+    Image.new('RGB', size, 'orange').save(buffer, image_format)
+    return buffer.getvalue()
+
+
+def get_image(size=(32, 24), image_format='PNG'):
+    return f'data:image/{image_format.lower()};base64,' + base64.b64encode(
+        get_image_bytes(size, image_format)
+    ).decode()
+
+
+class ApiTestMixin:
+    @classmethod
+    def setUpTestData(cls):
+        cls.tags = [
+            Tag.objects.create(name=f'Тег {i}', color=f'#00000{i}',
+                               slug=f'tag{i}')
+            for i in range(3)
+        ]
+        cls.ingredients = [
+            Ingredient.objects.create(name=f'Ингредиент {i}',
+                                      measurement_unit='г')
+            for i in range(10)
+        ]
+        cls.users = [
+            User.objects.create_user(
+                username=f'user{i}', email=f'user{i}@example.com',
+                password='password', first_name='Имя', last_name='Фамилия'
+            )
+            for i in range(4)
+        ]
+        cls.user, cls.authors = cls.users[0], cls.users[1:]
+        cls.recipes = []
+        for i in range(12):
+            recipe = Recipe.objects.create(
+                author=cls.authors[i % len(cls.authors)],
+                name=f'Рецепт {i}',
+                text='Описание',
+                cooking_time=10,
+                image='recipes/images/recipe.png',
+            )
+            recipe.tags.set(cls.tags[:i % 3 + 1])
+            IngredientAmount.objects.bulk_create(
+                IngredientAmount(recipe=recipe, ingredient=ingredient,
+                                 amount=j + 1)
+                for j, ingredient in enumerate(
+                    cls.ingredients[i % 5:i % 5 + 3]
+                )
+            )
+            cls.recipes.append(recipe)
+        for author in cls.authors:
+            Follow.objects.create(user=cls.user, author=author)
+        for recipe in cls.recipes[:5]:
+            Favorite.objects.create(user=cls.user, recipe=recipe)
+            ShoppingCart.objects.create(user=cls.user, recipe=recipe)
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        shutil.rmtree(MEDIA_ROOT, ignore_errors=True)
+
+    def setUp(self):
+        cache.clear()
+        caches['responses'].clear()
+        self.guest = APIClient()
+        self.client = self.get_client(self.user)
+
+    def get_client(self, user):
+        client = APIClient()
+        client.credentials(
+            HTTP_AUTHORIZATION=f'Token {Token.objects.create(user=user).key}'
+        )
+        return client
+
+    def get_recipe_data(self, **data):
+        return {
+            'name': 'Новый рецепт',
+            'text': 'Описание',
+            'cooking_time': 15,
+            'image': get_image(),
+            'tags': [tag.id for tag in self.tags[:2]],
+            'ingredients': [
+                {'id': ingredient.id, 'amount': 10}
+                for ingredient in self.ingredients[:3]
+            ],
+            **data,
+        }
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class ApiTestCase(ApiTestMixin, TestCase):
+    pass
+
+
+INGREDIENTS = [
+    {'name': f'Продукт «{i}» ' + 'ё' * i, 'measurement_unit': 'г'}
+    for i in range(25)
+]
+
+
+class LoadIngredientsTest(TestCase):
+    def setUp(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        self.json_path = os.path.join(directory, 'ingredients.json')
+        with open(self.json_path, 'w', encoding='utf-8') as file:
+            json.dump(INGREDIENTS, file, ensure_ascii=False, indent=2)
+        self.csv_path = os.path.join(directory, 'ingredients.csv')
+        with open(self.csv_path, 'w', encoding='utf-8', newline='') as file:
+            csv.writer(file).writerows(
+                (item['name'], item['measurement_unit'])
+                for item in INGREDIENTS
+            )
+
+    def load(self, path, chunk_size=7):
+        stdout = StringIO()
+        with mock.patch(
+            'recipes.management.commands.load_ingredients.CHUNK_SIZE',
+            chunk_size
+        ):
+            call_command('load_ingredients', path, batch_size=4, stdout=stdout)
+        return stdout.getvalue()
+
+    def assertLoaded(self):
+        self.assertEqual(
+            set(Ingredient.objects.values_list('name', 'measurement_unit')),
+            {(item['name'], item['measurement_unit']) for item in INGREDIENTS}
+        )
+
+    def test_load(self):
+        for file_path in (self.json_path, self.csv_path):
+            with self.subTest(path=os.path.basename(file_path)):
+                Ingredient.objects.all().delete()
+                self.assertIn(
+                    f'добавлено: {len(INGREDIENTS)}', self.load(file_path)
+                )
+                self.assertLoaded()
+
+    def test_reload_is_idempotent(self):
+        self.load(self.json_path)
+        for file_path in (self.json_path, self.csv_path):
+            with self.subTest(path=os.path.basename(file_path)):
+                output = self.load(file_path)
+                self.assertIn('добавлено: 0', output)
+                self.assertIn(f'пропущено: {len(INGREDIENTS)}', output)
+                self.assertLoaded()
+
+    def test_invalid_json(self):
+        for content in ('{"name": "соль"}', '[{"name": "соль", ', '[{]'):
+            with self.subTest(content=content):
+                with open(self.json_path, 'w', encoding='utf-8') as file:
+                    file.write(content)
+                with self.assertRaises(CommandError):
+                    self.load(self.json_path)
+
+
+class RecipeListTest(ApiTestCase):
+    def test_query_count_does_not_depend_on_page_size(self):
+        for client in (self.client, self.guest):
+            with self.subTest(guest=client is self.guest):
+                cache.clear()
+                caches['responses'].clear()
+                with CaptureQueriesContext(connection) as queries:
+                    response = client.get('/api/recipes/', {'limit': 2})
+                self.assertEqual(len(response.data['results']), 2)
+                cache.clear()
+                caches['responses'].clear()
+                with self.assertNumQueries(len(queries)):
+                    response = client.get('/api/recipes/', {'limit': 50})
+                self.assertEqual(
+                    len(response.data['results']), len(self.recipes)
+                )
+
+    def test_page_size_is_capped(self):
+        call_command('refresh_rankings', stdout=StringIO())
+        with mock.patch.object(RecipePagination, 'max_page_size', 5):
+            for url in ('/api/recipes/', '/api/recipes/top/'):
+                with self.subTest(url=url):
+                    response = self.client.get(url, {'limit': 100000})
+                    self.assertEqual(response.status_code, 200)
+                    results = response.data
+                    if isinstance(results, dict):
+                        results = results['results']
+                    self.assertEqual(len(results), 5)
+
+    def test_cursor_rejects_custom_order(self):
+        for params in (
+            {'ordering': 'popular'},
+            {'ordering': '-favorites_count'},
+            {'search': 'Рецепт'},
+        ):
+            with self.subTest(**params):
+                response = self.client.get(
+                    '/api/recipes/', {'pagination': 'cursor', **params}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn(next(iter(params)), response.data)
+
+
+class RecipeFilterTest(ApiTestCase):
+    def get_ids(self, client, **params):
+        response = client.get('/api/recipes/', params)
+        self.assertEqual(response.status_code, 200)
+        return {recipe['id'] for recipe in response.data}
+
+    def get_tag_ids(self, recipe):
+        return set(recipe.tags.values_list('id', flat=True))
+
+    def assertTagMasksInSync(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                recipe.tags_mask, get_tags_mask(self.get_tag_ids(recipe)),
+                recipe.name
+            )
+
+    def test_search(self):
+        soup, salad = self.recipes[:2]
+        soup.name = 'Борщ с говядиной'
+        soup.save()
+        beet = self.ingredients[-1]
+        IngredientAmount.objects.create(
+            recipe=salad, ingredient=beet, amount=1
+        )
+        beet.name = 'Свёкла'
+        beet.save()
+        for text, expected in (
+            ('Борщ', {soup.id}),
+            ('Свёкла', {salad.id}),
+            ('Ананас', set()),
+        ):
+            for client in (self.client, self.guest):
+                with self.subTest(text=text, guest=client is self.guest):
+                    self.assertEqual(
+                        self.get_ids(client, search=text), expected
+                    )
+
+    def test_user_recipes_filters(self):
+        favorites = {recipe.id for recipe in self.recipes[:5]}
+        everything = {recipe.id for recipe in self.recipes}
+        for name in ('is_favorited', 'is_in_shopping_cart'):
+            with self.subTest(name=name):
+                self.assertEqual(
+                    self.get_ids(self.client, **{name: 1}), favorites
+                )
+                self.assertEqual(
+                    self.get_ids(self.client, **{name: 0}),
+                    everything - favorites
+                )
+                self.assertEqual(self.get_ids(self.guest, **{name: 1}), set())
+                self.assertEqual(
+                    self.get_ids(self.guest, **{name: 0}), everything
+                )
+
+    def test_tags(self):
+        slugs = {'tag1', 'tag2'}
+        tags = {
+            recipe.id: set(recipe.tags.values_list('slug', flat=True))
+            for recipe in self.recipes
+        }
+        for mode, expected in (
+            ('any', {pk for pk, recipe_tags in tags.items()
+                     if recipe_tags & slugs}),
+            ('all', {pk for pk, recipe_tags in tags.items()
+                     if recipe_tags >= slugs}),
+        ):
+            with self.subTest(mode=mode):
+                ids = self.get_ids(
+                    self.guest, tags=sorted(slugs), tags_mode=mode
+                )
+                self.assertEqual(ids, expected)
+                self.assertTrue(ids)
+        self.assertEqual(
+            self.get_ids(self.guest, tags=['tag0']),
+            {recipe.id for recipe in self.recipes}
+        )
+
+    def test_tags_mask_stays_in_sync(self):
+        recipe, tag = self.recipes[0], self.tags[2]
+        recipe.tags.set(self.tags[1:])
+        self.assertTagMasksInSync()
+        recipe.tags.remove(self.tags[1])
+        self.assertTagMasksInSync()
+        tag.recipes.remove(*self.recipes[:4])
+        self.assertTagMasksInSync()
+        tag.recipes.add(*self.recipes[6:])
+        self.assertTagMasksInSync()
+        self.tags[1].recipes.clear()
+        self.assertTagMasksInSync()
+        recipe.tags.clear()
+        self.assertTagMasksInSync()
+        tag.delete()
+        self.assertTagMasksInSync()
+
+
+class RecipeWriteTest(ApiTestCase):
+    @enforce_query_budgets
+    def test_create_query_budget(self):
+        queries = []
+        for i, (tags, ingredients) in enumerate((
+            (self.tags[:1], self.ingredients[:1]),
+            (self.tags, self.ingredients[:8]),
+        )):
+            cache.clear()
+            response = self.client.post('/api/recipes/', self.get_recipe_data(
+                name=f'Рецепт {i}',
+                tags=[tag.id for tag in tags],
+                ingredients=[
+                    {'id': ingredient.id, 'amount': 1}
+                    for ingredient in ingredients
+                ]
+            ), format='json')
+            self.assertEqual(response.status_code, 201)
+            metrics = get_request_metrics(response)
+            self.assertLessEqual(metrics['queries'], metrics['budget'])
+            queries.append(metrics['queries'])
+        self.assertEqual(queries[0], queries[1])
+
+    @enforce_query_budgets
+    def test_create_with_cached_token(self):
+        self.client.get('/api/users/me/')
+        for i in range(2):
+            response = self.client.post('/api/recipes/', self.get_recipe_data(
+                name=f'Рецепт {i}'
+            ), format='json')
+            self.assertEqual(response.status_code, 201)
+            self.user.refresh_from_db()
+            self.assertEqual(
+                response.data['author']['recipes_count'],
+                self.user.recipes_count
+            )
+            self.assertEqual(
+                response.data['author']['followers_count'],
+                self.user.followers_count
+            )
+            metrics = get_request_metrics(response)
+            self.assertLessEqual(metrics['queries'], metrics['budget'])
+
+    def test_duplicate_name(self):
+        response = self.get_client(self.authors[0]).post(
+            '/api/recipes/',
+            self.get_recipe_data(name=self.recipes[0].name),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['non_field_errors'], [DUPLICATE_RECIPE_MESSAGE]
+        )
+
+    def test_duplicate_name_on_update(self):
+        response = self.get_client(self.authors[0]).patch(
+            f'/api/recipes/{self.recipes[0].id}/',
+            self.get_recipe_data(name=self.recipes[3].name),
+            format='json'
+        )
+        self.assertEqual(response.status_code, 400)
+        self.assertEqual(
+            response.data['non_field_errors'], [DUPLICATE_RECIPE_MESSAGE]
+        )
+
+    def test_other_integrity_errors_are_not_masked(self):
+        with mock.patch.object(
+            IngredientAmount.objects, 'bulk_create',
+            side_effect=IntegrityError('FOREIGN KEY constraint failed')
+        ), self.assertRaises(IntegrityError):
+            self.client.post(
+                '/api/recipes/', self.get_recipe_data(), format='json'
+            )
+
+
+class CounterTest(ApiTestCase):
+    def assertCountersMatch(self):
+        for recipe in Recipe.objects.all():
+            self.assertEqual(
+                (recipe.favorites_count, recipe.carts_count),
+                (recipe.favorite.count(), recipe.shopping_cart.count())
+            )
+        for user in User.objects.all():
+            self.assertEqual(
+                (user.recipes_count, user.followers_count),
+                (user.recipes.count(), user.following.count())
+            )
+
+    def test_cascade_deletes_keep_counters(self):
+        self.recipes[0].delete()
+        self.assertCountersMatch()
+        Recipe.objects.filter(pk__in=[
+            recipe.pk for recipe in self.recipes[1:4]
+        ]).delete()
+        self.assertCountersMatch()
+        self.authors[0].delete()
+        self.assertCountersMatch()
+        User.objects.filter(pk=self.user.pk).delete()
+        self.assertCountersMatch()
+
+    def test_failed_delete_does_not_skip_later_updates(self):
+        recipe = self.recipes[0]
+
+        def fail(**kwargs):
+            raise DatabaseError('Сбой удаления')
+
+        post_delete.connect(fail, sender=Favorite)
+        try:
+            with self.assertRaises(DatabaseError), transaction.atomic():
+                recipe.delete()
+        finally:
+            post_delete.disconnect(fail, sender=Favorite)
+        Favorite.objects.filter(recipe=recipe).delete()
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.favorites_count, 0)
+        self.assertCountersMatch()
+
+
+class RecipeImageTest(ApiTestCase):
+    def test_decodes_image(self):
+        file = StreamingBase64ImageField().to_internal_value(get_image())
+        self.assertTrue(file.name.endswith('.png'))
+        self.assertEqual(file.content_type, 'image/png')
+        self.assertEqual(file.size, len(get_image_bytes()))
+        with Image.open(file) as image:
+            self.assertEqual(image.size, (32, 24))
+
+    def test_size_limit(self):
+        size = len(get_image_bytes())
+        for max_size in (size // 2, size - 1):
+            with self.subTest(max_size=max_size):
+                with self.assertRaisesMessage(
+                    ValidationError, f'{max_size} байт'
+                ):
+                    StreamingBase64ImageField(
+                        max_size=max_size
+                    ).to_internal_value(get_image())
+        StreamingBase64ImageField(max_size=size).to_internal_value(
+            get_image()
+        )
+
+    def test_rejects_invalid_images(self):
+        for data in (
+            'data:image/png;base64,@@@',
+            base64.b64encode(b'not an image').decode(),
+            get_image(image_format='BMP'),
+        ):
+            with self.subTest(data=data[:30]):
+                with self.assertRaises(ValidationError):
+                    StreamingBase64ImageField().to_internal_value(data)
+
+    def test_build_variants(self):
+        recipe = self.recipes[0]
+        recipe.image.save(
+            'recipe.png', ContentFile(get_image_bytes((1000, 600))),
+            save=True
+        )
+        variants = build_variants(recipe)
+        self.assertEqual(set(variants), {'source', *VARIANTS})
+        self.assertEqual(get_variants(recipe), {
+            name: path for name, path in variants.items() if name != 'source'
+        })
+        storage = recipe.image.storage
+        for name, (size, image_format) in VARIANTS.items():
+            with self.subTest(variant=name):
+                with storage.open(variants[name]) as file, Image.open(
+                    file
+                ) as image:
+                    self.assertEqual(image.format, image_format)
+                    self.assertLessEqual(
+                        max(image.size), max(size or image.size)
+                    )
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, variants)
+
+    def test_process_images_builds_pending_variants(self):
+        response = self.client.post(
+            '/api/recipes/', self.get_recipe_data(), format='json'
+        )
+        self.assertEqual(response.status_code, 201)
+        recipe = Recipe.objects.get(pk=response.data['id'])
+        self.assertEqual(get_variants(recipe), {})
+        call_command('process_images', stdout=StringIO(), stderr=StringIO())
+        recipe.refresh_from_db()
+        self.assertEqual(set(get_variants(recipe)), set(VARIANTS))
+        response = self.client.get(f'/api/recipes/{recipe.id}/')
+        self.assertEqual(set(response.data['image_variants']), set(VARIANTS))
+
+
+class SubscriptionsTest(ApiTestCase):
+    def test_recipes_limit(self):
+        response = self.client.get(
+            '/api/users/subscriptions/', {'limit': 2, 'recipes_limit': 1}
+        )
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data['count'], len(self.authors))
+        self.assertEqual(
+            [len(author['recipes']) for author in response.data['results']],
+            [1, 1]
+        )
+
+    def test_invalid_recipes_limit(self):
+        for value in ('x', '-1', '1.5'):
+            with self.subTest(recipes_limit=value):
+                response = self.client.get(
+                    '/api/users/subscriptions/', {'recipes_limit': value}
+                )
+                self.assertEqual(response.status_code, 400)
+                self.assertIn('recipes_limit', response.data)
+
+
+@enforce_query_budgets
+class QueryBudgetTest(ApiTestCase):
+    def assertWithinBudget(self, response, status=200):
+        if response.streaming:
+            b''.join(response.streaming_content)
+        self.assertEqual(
+            response.status_code, status, getattr(response, 'data', None)
+        )
+        metrics = get_request_metrics(response)
+        self.assertIsNotNone(metrics['budget'], metrics['view'])
+        self.assertLessEqual(metrics['queries'], metrics['budget'])
+
+    def test_recipe_reads(self):
+        call_command('refresh_rankings', stdout=StringIO())
+        recipe = self.recipes[0]
+        for client in (self.client, self.guest):
+            for url in (
+                '/api/recipes/?limit=6',
+                '/api/recipes/?limit=6&is_favorited=1&tags=tag0&tags=tag1',
+                '/api/recipes/?pagination=cursor',
+                '/api/recipes/top/',
+                f'/api/recipes/{recipe.id}/',
+            ):
+                with self.subTest(url=url, guest=client is self.guest):
+                    cache.clear()
+                    caches['responses'].clear()
+                    self.assertWithinBudget(client.get(url))
+
+    def test_recipe_create(self):
+        self.assertWithinBudget(self.client.post(
+            '/api/recipes/', self.get_recipe_data(), format='json'
+        ), 201)
+
+    def test_recipe_update(self):
+        client = self.get_client(self.recipes[0].author)
+        url = f'/api/recipes/{self.recipes[0].id}/'
+        data = self.get_recipe_data(tags=[self.tags[2].id], ingredients=[
+            {'id': ingredient.id, 'amount': 5}
+            for ingredient in self.ingredients[2:6]
+        ])
+        self.assertWithinBudget(client.put(url, data, format='json'))
+        del data['image']
+        data['name'] = 'Другое название'
+        self.assertWithinBudget(client.patch(url, data, format='json'))
+
+    def test_recipe_destroy(self):
+        recipe = self.recipes[0]
+        for user in self.users[1:]:
+            Favorite.objects.create(user=user, recipe=recipe)
+            ShoppingCart.objects.create(user=user, recipe=recipe)
+        self.assertWithinBudget(self.get_client(recipe.author).delete(
+            f'/api/recipes/{recipe.id}/'
+        ), 204)
+
+    def test_favorite_and_shopping_cart(self):
+        recipe = self.recipes[-1]
+        for action in ('favorite', 'shopping_cart'):
+            url = f'/api/recipes/{recipe.id}/{action}/'
+            with self.subTest(action=action):
+                self.assertWithinBudget(self.client.post(url), 201)
+                self.assertWithinBudget(self.client.delete(url), 204)
+
+    def test_download_shopping_cart(self):
+        self.assertWithinBudget(
+            self.client.get('/api/recipes/download_shopping_cart/')
+        )
+
+    def test_user_reads(self):
+        for url in (
+            '/api/users/?limit=6',
+            f'/api/users/{self.authors[0].id}/',
+            '/api/users/me/',
+            '/api/users/subscriptions/?limit=6&recipes_limit=3',
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                self.assertWithinBudget(self.client.get(url))
+
+    def test_subscribe(self):
+        client = self.get_client(self.authors[0])
+        url = f'/api/users/{self.authors[1].id}/subscribe/'
+        self.assertWithinBudget(client.post(url), 201)
+        self.assertWithinBudget(client.delete(url), 204)
+
+    def test_tags_and_ingredients(self):
+        for url in (
+            '/api/tags/',
+            f'/api/tags/{self.tags[0].id}/',
+            '/api/ingredients/',
+            '/api/ingredients/?name=Инг',
+            f'/api/ingredients/{self.ingredients[0].id}/',
+        ):
+            with self.subTest(url=url):
+                self.assertWithinBudget(self.guest.get(url))
+
+
+class CacheTest(ApiTestCase):
+    def test_catalogue_version_changes_after_commit(self):
+        for namespace, instance in (
+            ('tags', self.tags[0]),
+            ('ingredients', self.ingredients[0]),
+        ):
+            with self.subTest(namespace=namespace), mock.patch(
+                'api.signals.bump_version'
+            ) as bump_version:
+                with self.captureOnCommitCallbacks(execute=True):
+                    instance.save()
+                    bump_version.assert_not_called()
+                bump_version.assert_any_call(namespace)
+
+    def test_anonymous_repeat_request_runs_no_queries(self):
+        for url in ('/api/recipes/', f'/api/recipes/{self.recipes[0].id}/'):
+            with self.subTest(url=url):
+                expected = self.guest.get(url)
+                with self.assertNumQueries(0):
+                    response = self.guest.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertEqual(response.data, expected.data)
+
+    def test_recipe_change_invalidates_cached_responses(self):
+        recipe = self.recipes[0]
+        url = f'/api/recipes/{recipe.id}/'
+        etag = self.guest.get(url)['ETag']
+        self.guest.get('/api/recipes/')
+        with self.captureOnCommitCallbacks(execute=True):
+            response = self.get_client(recipe.author).patch(
+                url, {'name': 'Новое название'}, format='json'
+            )
+        self.assertEqual(response.status_code, 200)
+        response = self.guest.get(url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertEqual(response.data['name'], 'Новое название')
+        self.assertIn('Новое название', [
+            item['name'] for item in self.guest.get('/api/recipes/').data
+        ])
+
+    def test_tag_change_invalidates_cached_responses(self):
+        url = '/api/recipes/'
+        etag = self.guest.get(url)['ETag']
+        with self.captureOnCommitCallbacks(execute=True):
+            self.tags[0].save()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.guest.get(url)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertGreater(len(queries), 0)
+
+    def test_version_does_not_expire(self):
+        version = get_version('tags')
+        with mock.patch('time.time', return_value=(
+            time.time() + settings.API_CACHE_TIMEOUT + 1
+        )):
+            self.assertEqual(get_version('tags'), version)
+
+
+@override_settings(MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0)
+class AsyncViewsTest(ApiTestMixin, TransactionTestCase):
+    def setUp(self):
+        patcher = mock.patch.dict(
+            connections.databases[DEFAULT_DB_ALIAS], CONN_MAX_AGE=0
+        )
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.setUpTestData()
+        super().setUp()
+
+    def get_token(self, user):
+        return Token.objects.get_or_create(user=user)[0].key
+
+    def assertSameResponses(self, method, url, data=None, token=None,
+                            **extra):
+        headers = {} if token is None else {
+            'HTTP_AUTHORIZATION': f'Token {token}'
+        }
+        cache.clear()
+        caches['responses'].clear()
+        expected = getattr(APIClient(), method)(url, data, **headers, **extra)
+        cache.clear()
+        caches['responses'].clear()
+        if token is not None:
+            headers = {'authorization': f'Token {token}'}
+        if 'format' in extra:
+            data = json.dumps(data)
+            headers['content_type'] = 'application/json'
+        elif data and method == 'get':
+            url, data = f'{url}?{urlencode(data)}', None
+
+        async def request():
+            return await getattr(self.async_client, method)(
+                url, data, **headers
+            )
+
+        with override_settings(ROOT_URLCONF=__name__):
+            response = async_to_sync(request)()
+        self.assertEqual(response.status_code, expected.status_code)
+        self.assertEqual(response.json(), expected.json())
+        self.assertEqual(
+            response.get('WWW-Authenticate'), expected.get('WWW-Authenticate')
+        )
+        return response
+
+    def test_same_responses(self):
+        token = self.get_token(self.user)
+        recipe = self.recipes[0]
+        for url, data in (
+            ('/api/tags/', None),
+            ('/api/ingredients/', None),
+            ('/api/ingredients/', {'name': 'Ингредиент 1'}),
+            (f'/api/recipes/{recipe.id}/', None),
+            ('/api/recipes/0/', None),
+            ('/api/users/subscriptions/', None),
+            ('/api/users/subscriptions/', {
+                'limit': 2, 'page': 2, 'recipes_limit': 1
+            }),
+            ('/api/users/subscriptions/', {'recipes_limit': 'x'}),
+        ):
+            for user_token in (None, token, 'invalid'):
+                with self.subTest(url=url, data=data, token=user_token):
+                    self.assertSameResponses('get', url, data, user_token)
+
+    def test_other_methods_fall_back_to_viewsets(self):
+        recipe = self.recipes[0]
+        token = self.get_token(recipe.author)
+        self.assertSameResponses(
+            'patch', f'/api/recipes/{recipe.id}/', {'cooking_time': 20},
+            token, format='json'
+        )
+        self.assertSameResponses('post', '/api/tags/', {}, token)
+
+
+@override_settings(
+    MEDIA_ROOT=MEDIA_ROOT, RECIPE_IMAGE_WORKERS=0, DB_REPLICAS=['replica_1']
+)
+class ReplicaRoutingTest(ApiTestMixin, TransactionTestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        primary = connections[DEFAULT_DB_ALIAS].settings_dict
+        connections.settings['replica_1'] = {
+            **primary, 'TEST': {**primary['TEST'], 'MIRROR': DEFAULT_DB_ALIAS}
+        }
+
+    @classmethod
+    def tearDownClass(cls):
+        connections['replica_1'].close()
+        del connections['replica_1']
+        del connections.settings['replica_1']
+        super().tearDownClass()
+
+    def setUp(self):
+        self.setUpTestData()
+        super().setUp()
+
+    def get_queries(self, request):
+        with CaptureQueriesContext(connections[DEFAULT_DB_ALIAS]) as primary:
+            with CaptureQueriesContext(connections['replica_1']) as replica:
+                self.assertEqual(request().status_code // 100, 2)
+        return len(primary), len(replica)
+
+    def test_reads_go_to_replica(self):
+        for url in (
+            '/api/recipes/',
+            f'/api/recipes/{self.recipes[0].id}/',
+            '/api/users/subscriptions/',
+        ):
+            with self.subTest(url=url):
+                cache.clear()
+                primary, replica = self.get_queries(
+                    lambda: self.client.get(url)
+                )
+                self.assertGreater(replica, 0)
+                self.assertEqual(primary, 1)
+
+    def test_client_is_pinned_to_primary_after_write(self):
+        url = f'/api/recipes/{self.recipes[-1].id}/favorite/'
+        primary, replica = self.get_queries(lambda: self.client.post(url))
+        self.assertGreater(primary, 0)
+        primary, replica = self.get_queries(
+            lambda: self.client.get('/api/recipes/')
+        )
+        self.assertEqual(replica, 0)
+        self.assertGreater(primary, 0)
+        primary, replica = self.get_queries(
+            lambda: self.get_client(self.authors[0]).get('/api/recipes/')
+        )
+        self.assertGreater(replica, 0)
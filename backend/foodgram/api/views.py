@@ -1,6 +1,8 @@
+from itertools import chain
+
 from django.contrib.auth import get_user_model
-from django.db.models import Sum
-from django.http import FileResponse
+from django.db.models import Prefetch, Sum, prefetch_related_objects
+from django.http import StreamingHttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.conf import settings
@@ -10,11 +12,15 @@ from rest_framework.decorators import action
 from rest_framework.permissions import IsAuthenticated
 from rest_framework.response import Response
 
-from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag)
 from users.models import Follow
-from .filters import IngredientFilter, RecipeFilter
-from .misc import recipe_m2m_create_delete
-from .pagination import CustomPageNumberPagination
+from .cache import VersionedCacheMixin
+from .exporters import EXPORTERS
+from .filters import RecipeFilter, UserFilter
+from .indexes import ingredient_index
+from .misc import get_recipes_limit, recipe_m2m_create_delete
+from .pagination import CustomPageNumberPagination, RecipePagination
 from .permissions import AuthorOrReadOnly
 from .serializers import (FavoriteSerializer, IngredientSerializer,
                           RecipeReadSerializer,RecipeShortSerializer,
@@ -23,9 +29,35 @@ from .serializers import (FavoriteSerializer, IngredientSerializer,
 
 User = get_user_model()
 
+TOP_RECIPES_LIMIT = 10
+
+
+def with_limited_recipes(authors, limit):
+    authors = list(authors)
+    prefetch_related_objects(authors, Prefetch(
+        'recipes',
+        queryset=Recipe.objects.filter(
+            author__in=authors
+        ).limit_per_author(limit),
+        to_attr='limited_recipes'
+    ))
+    return authors
+
 
 class UserViewSet(DjUserViewSet):
     pagination_class = CustomPageNumberPagination
+    filter_backends = (DjangoFilterBackend,)
+    filterset_class = UserFilter
+    query_budgets = {
+        'list': 4,
+        'retrieve': 3,
+        'me': 2,
+        'subscriptions': 4,
+        'subscribe': 8,
+    }
+
+    def get_instance(self):
+        return get_object_or_404(User, pk=self.request.user.pk)
 
     def get_serializer_class(self):
         if self.action == 'subscribe':
@@ -57,43 +89,82 @@ class UserViewSet(DjUserViewSet):
 
     @action(methods=['get'], detail=False)
     def subscriptions(self, request):
-        pages = self.paginate_queryset(
-            User.objects.filter(following__user=request.user)
-        )
+        limit = get_recipes_limit(request)
+        authors = User.objects.filter(
+            following__user=request.user
+        ).order_by('id')
+        page = self.paginate_queryset(authors)
         serializer = self.get_serializer(
-            pages,
+            with_limited_recipes(authors if page is None else page, limit),
             many=True,
             context={'request': request}
         )
+        if page is None:
+            return Response(serializer.data)
         return self.get_paginated_response(serializer.data)
 
 
-class RecipeViewSet(viewsets.ModelViewSet):
-    pagination_class = CustomPageNumberPagination
+class RecipeViewSet(VersionedCacheMixin, viewsets.ModelViewSet):
+    cache_namespace = 'recipes'
+    pagination_class = RecipePagination
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     permission_classes = (AuthorOrReadOnly,)
+    query_budgets = {
+        'list': 7,
+        'retrieve': 7,
+        'top': 5,
+        'create': 7,
+        'update': 17,
+        'partial_update': 17,
+        'destroy': 13,
+        'favorite': 7,
+        'shopping_cart': 7,
+        'download_shopping_cart': 2,
+    }
+
+    def is_cacheable(self, request):
+        return request.user.is_anonymous
 
     def get_queryset(self):
+        if self.action == 'destroy':
+            return Recipe.objects.all()
         if self.request.user.is_authenticated:
-            return (
+            queryset = (
                 Recipe.objects.add_favorite_cart(self.request.user)
-                .prefetch_related('tags', 'author', 'ingredients')
+                .with_related()
             )
         else:
-            return (
-                Recipe.objects.
-                prefetch_related('tags', 'author', 'ingredients')
+            queryset = Recipe.objects.all()
+        if self.action == 'top':
+            return queryset.filter(rank__isnull=False).order_by(
+                '-rank__popular', '-pub_date'
             )
+        return queryset
 
     def get_serializer_class(self):
         if self.request.user.is_anonymous:
             return RecipeShortSerializer
-        elif self.action in ('retrieve'):
+        elif self.action in ('list', 'retrieve', 'top'):
             return RecipeReadSerializer
         else:
             return RecipeWriteSerializer
 
+    def get_serializer_context(self):
+        return {
+            **super().get_serializer_context(),
+            'image_variant': (
+                'thumbnail' if self.action in ('list', 'top') else None
+            ),
+        }
+
+    @action(methods=['get'], detail=False)
+    def top(self, request):
+        limit = self.paginator.get_page_size(request) or TOP_RECIPES_LIMIT
+        queryset = self.filter_queryset(self.get_queryset())[:limit]
+        serializer = self.get_serializer(queryset, many=True)
+        return Response(serializer.data)
+
     @action(
         methods=['post', 'delete'],
         detail=True,
@@ -126,37 +197,50 @@ class RecipeViewSet(viewsets.ModelViewSet):
         permission_classes=(IsAuthenticated,)
     )
     def download_shopping_cart(self, request):
-        current_user = request.user
-        if not current_user.shopping_cart.exists():
+        file_type = request.query_params.get('type', 'txt')
+        if file_type not in EXPORTERS:
             return Response(status=status.HTTP_400_BAD_REQUEST)
-
         ingredients = (
-            Ingredient.objects.filter(
-                recipes__shopping_cart__user=current_user
-            ).annotate(amount=Sum('recipe__amount')).
-            values_list('name', 'amount', 'measurement_unit')
+            IngredientAmount.objects.filter(
+                recipe__shopping_cart__user=request.user
+            ).values_list('ingredient__name', 'ingredient__measurement_unit')
+            .annotate(amount=Sum('amount'))
+            .order_by('ingredient__name', 'ingredient__measurement_unit')
+            .iterator()
+        )
+        first = next(ingredients, None)
+        if first is None:
+            return Response(status=status.HTTP_400_BAD_REQUEST)
+
+        content_type, exporter = EXPORTERS[file_type]
+        response = StreamingHttpResponse(
+            exporter(chain((first,), ingredients)),
+            content_type=content_type,
         )
-        cart = 'Список покупок\n\n'
-        for item in ingredients:
-            cart += ' '.join(map(str, item)) + '\n'
-
-        return FileResponse(
-            cart,
-            content_type='text/plain',
-            as_attachment=True,
-            status=status.HTTP_200_OK
+        response['Content-Disposition'] = (
+            f'attachment; filename="shopping_cart.{file_type}"'
         )
+        return response
 
 
-class TagViewSet(viewsets.ReadOnlyModelViewSet):
+class TagViewSet(VersionedCacheMixin, viewsets.ReadOnlyModelViewSet):
+    cache_namespace = 'tags'
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     pagination_class = None
+    query_budgets = {'list': 2, 'retrieve': 2}
 
 
-class IngredientViewSet(viewsets.ReadOnlyModelViewSet):
+class IngredientViewSet(VersionedCacheMixin,
+                        viewsets.ReadOnlyModelViewSet):
+    cache_namespace = 'ingredients'
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
-    filter_backends = (DjangoFilterBackend,)
-    filterset_class = IngredientFilter
     pagination_class = None
+    query_budgets = {'list': 2, 'retrieve': 2}
+
+    def filter_queryset(self, queryset):
+        name = self.request.query_params.get('name')
+        if self.action != 'list' or name is None:
+            return queryset
+        return ingredient_index.search(name)
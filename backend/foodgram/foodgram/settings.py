@@ -31,6 +31,8 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'api.middleware.RequestMetricsMiddleware',
+    'api.middleware.ReplicaMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
@@ -60,16 +62,70 @@ TEMPLATES = [
 
 WSGI_APPLICATION = 'foodgram.wsgi.application'
 
+ASGI_APPLICATION = 'foodgram.asgi.application'
+
+ASYNC_VIEWS = env.bool('ASYNC_VIEWS', False)
+
+DB_ENGINE = env.str('DB_ENGINE', 'django.db.backends.postgresql')
+
 DATABASES = {
     'default': {
-        'ENGINE': env.str('DB_ENGINE', 'django.db.backends.postgresql'),
+        'ENGINE': DB_ENGINE,
         'NAME': env.str('DB_NAME', 'postgres'),
         'USER': env.str('POSTGRES_USER', 'postgres'),
         'PASSWORD': env.str('POSTGRES_PASSWORD', '123456'),
         'HOST': env.str('DB_HOST', 'localhost'),
-        'PORT': env.str('DB_PORT', '5432')
+        'PORT': env.str('DB_PORT', '5432'),
+        'CONN_MAX_AGE': env.int('DB_CONN_MAX_AGE', 60),
+        'CONN_HEALTH_CHECKS': env.bool('DB_CONN_HEALTH_CHECKS', True),
+        'DISABLE_SERVER_SIDE_CURSORS': env.bool(
+            'DB_DISABLE_SERVER_SIDE_CURSORS', False
+        ),
+        'OPTIONS': (
+            {'connect_timeout': env.int('DB_CONNECT_TIMEOUT', 5)}
+            if 'postgresql' in DB_ENGINE else {}
+        ),
+    }
+}
+
+DB_REPLICAS = []
+for index, replica in enumerate(env.list('DB_REPLICA_HOSTS', []), 1):
+    host, _, port = replica.partition(':')
+    DB_REPLICAS.append(f'replica_{index}')
+    DATABASES[f'replica_{index}'] = {
+        **DATABASES['default'],
+        'HOST': host,
+        'PORT': port or DATABASES['default']['PORT'],
+        'TEST': {'MIRROR': 'default'},
+    }
+
+DATABASE_ROUTERS = ['api.routers.ReplicaRouter']
+
+DB_REPLICA_PIN_SECONDS = env.int('DB_REPLICA_PIN_SECONDS', 5)
+
+CACHES = {
+    'default': {
+        'BACKEND': env.str(
+            'CACHE_BACKEND',
+            'django.core.cache.backends.locmem.LocMemCache'
+        ),
+        'LOCATION': env.str('CACHE_LOCATION', ''),
     }
 }
+CACHES['responses'] = {
+    'BACKEND': env.str('RESPONSE_CACHE_BACKEND', CACHES['default']['BACKEND']),
+    'LOCATION': env.str(
+        'RESPONSE_CACHE_LOCATION', CACHES['default']['LOCATION']
+    ),
+}
+
+API_CACHE_TIMEOUT = env.int('API_CACHE_TIMEOUT', 300)
+
+API_CACHE_TIMEOUTS = {
+    'recipes': env.int('RECIPE_CACHE_TIMEOUT', 60),
+}
+
+AUTH_TOKEN_CACHE_TIMEOUT = env.int('AUTH_TOKEN_CACHE_TIMEOUT', 60)
 
 AUTH_PASSWORD_VALIDATORS = [
     {
@@ -102,15 +158,45 @@ STATIC_ROOT = os.path.join(BASE_DIR, 'back-static')
 MEDIA_URL = '/back-media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'back-media')
 
+RECIPE_IMAGE_MAX_SIZE = env.int('RECIPE_IMAGE_MAX_SIZE', 5 * 1024 * 1024)
+
+RECIPE_IMAGE_WORKERS = env.int('RECIPE_IMAGE_WORKERS', 2)
+
 AUTH_USER_MODEL = 'users.User'
 
+REQUEST_METRICS_SAMPLE_RATE = env.float('REQUEST_METRICS_SAMPLE_RATE', 0.05)
+
+QUERY_BUDGETS_ENFORCE = env.bool('QUERY_BUDGETS_ENFORCE', False)
+
+TEST_RUNNER = 'api.testing.TestRunner'
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'api.metrics': {
+            'handlers': ['console'],
+            'level': env.str('REQUEST_METRICS_LOG_LEVEL', 'INFO'),
+            'propagate': False,
+        },
+    },
+}
+
+SHOPPING_CART_PDF_FONT = env.str(
+    'SHOPPING_CART_PDF_FONT',
+    '/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf'
+)
+
 REST_FRAMEWORK = {
     'DEFAULT_PERMISSION_CLASSES': [
         'rest_framework.permissions.AllowAny',
     ],
 
     'DEFAULT_AUTHENTICATION_CLASSES': [
-        'rest_framework.authentication.TokenAuthentication',
+        'api.authentication.CachedTokenAuthentication',
     ],
 }
 
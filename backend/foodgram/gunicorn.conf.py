@@ -0,0 +1,86 @@
+import os
+from threading import Barrier
+
+from environs import Env
+
+env = Env()
+env.read_env()
+
+WORKER_CLASSES = {
+    'sync': 'sync',
+    'gthread': 'gthread',
+    'asgi': 'uvicorn.workers.UvicornWorker',
+}
+
+cpu_count = len(os.sched_getaffinity(0))
+worker_model = env.str('GUNICORN_WORKER_CLASS', 'gthread')
+if worker_model not in WORKER_CLASSES:
+    raise ValueError(
+        f'GUNICORN_WORKER_CLASS должен быть одним из: '
+        f'{", ".join(WORKER_CLASSES)}'
+    )
+
+wsgi_app = (
+    'foodgram.asgi:application' if worker_model == 'asgi'
+    else 'foodgram.wsgi:application'
+)
+worker_class = WORKER_CLASSES[worker_model]
+workers = env.int(
+    'GUNICORN_WORKERS',
+    2 * cpu_count + 1 if worker_model == 'sync' else cpu_count + 1
+)
+threads = env.int(
+    'GUNICORN_THREADS', 4 if worker_model == 'gthread' else 1
+)
+
+bind = env.str('GUNICORN_BIND', '0.0.0.0:8000')
+backlog = env.int('GUNICORN_BACKLOG', 2048)
+timeout = env.int('GUNICORN_TIMEOUT', 30)
+graceful_timeout = env.int('GUNICORN_GRACEFUL_TIMEOUT', 30)
+keepalive = env.int('GUNICORN_KEEPALIVE', 5)
+max_requests = env.int('GUNICORN_MAX_REQUESTS', 1000)
+max_requests_jitter = env.int('GUNICORN_MAX_REQUESTS_JITTER', 100)
+preload_app = env.bool('GUNICORN_PRELOAD', True)
+worker_tmp_dir = '/dev/shm' if os.path.isdir('/dev/shm') else None
+accesslog = env.str('GUNICORN_ACCESS_LOG', None)
+errorlog = '-'
+loglevel = env.str('GUNICORN_LOG_LEVEL', 'info')
+
+
+def when_ready(server):
+    from django.db import connections
+
+    connections.close_all()
+
+
+def open_connections(barrier=None):
+    from django.db import connections
+
+    if barrier is not None:
+        barrier.wait(timeout=timeout)
+    for connection in connections.all():
+        connection.ensure_connection()
+
+
+def post_worker_init(worker):
+    from django.db import connections
+    from django.urls import get_resolver
+
+    from api import serializers, views  # noqa: F401
+    from api.exporters import register_pdf_font
+    from api.indexes import ingredient_index
+
+    get_resolver().reverse_dict
+    open_connections()
+    ingredient_index.refresh()
+    register_pdf_font()
+    if worker_model == 'gthread':
+        barrier = Barrier(worker.cfg.threads)
+        for future in [
+            worker.tpool.submit(open_connections, barrier)
+            for _ in range(worker.cfg.threads)
+        ]:
+            future.result()
+    if worker_model != 'sync':
+        connections.close_all()
+    worker.log.info('Worker %s warmed up', worker.pid)
@@ -11,15 +11,12 @@ class IngredientInline(admin.TabularInline):
 
 @admin.register(Recipe)
 class RecipeAdmin(admin.ModelAdmin):
-    list_display = ('name', 'author')
+    list_display = ('name', 'author', 'favorites_count')
     list_filter = ('author', 'name', 'tags')
-    readonly_fields = ('favorite_count',)
+    readonly_fields = ('favorites_count', 'carts_count')
     search_fields = ('name',)
     inlines = (IngredientInline,)
 
-    def favorite_count(self, obj):
-        return obj.favorite.count()
-
 
 @admin.register(Tag)
 class TagAdmin(admin.ModelAdmin):
@@ -0,0 +1,27 @@
+from contextlib import contextmanager
+from threading import local
+
+deleting = local()
+
+
+def get_deleting(model):
+    pks = getattr(deleting, 'pks', None)
+    return set() if pks is None else pks.setdefault(model, set())
+
+
+@contextmanager
+def tracking_deletes():
+    if getattr(deleting, 'pks', None) is not None:
+        yield
+        return
+    deleting.pks = {}
+    try:
+        yield
+    finally:
+        deleting.pks = None
+
+
+class TrackedDeleteMixin:
+    def delete(self, *args, **kwargs):
+        with tracking_deletes():
+            return super().delete(*args, **kwargs)
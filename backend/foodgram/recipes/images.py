@@ -0,0 +1,103 @@
+import logging
+from concurrent.futures import ThreadPoolExecutor
+from io import BytesIO
+from pathlib import PurePosixPath
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.db import close_old_connections, connection, transaction
+from PIL import Image
+
+from api.cache import bump_version
+from .models import Recipe
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = 'recipe_images/variants'
+THUMBNAIL_SIZE = (480, 480)
+VARIANTS = {
+    'thumbnail': (THUMBNAIL_SIZE, 'JPEG'),
+    'thumbnail_webp': (THUMBNAIL_SIZE, 'WEBP'),
+    'webp': (None, 'WEBP'),
+}
+EXTENSIONS = {'JPEG': 'jpg', 'WEBP': 'webp'}
+
+executor = ThreadPoolExecutor(
+    max_workers=max(settings.RECIPE_IMAGE_WORKERS, 1),
+    thread_name_prefix='recipe-images'
+)
+
+
+def get_variants(recipe):
+    variants = recipe.image_variants or {}
+    if not recipe.image or variants.get('source') != recipe.image.name:
+        return {}
+    return {name: variants[name] for name in VARIANTS if name in variants}
+
+
+def render_variant(image, size, image_format):
+    if size is not None:
+        image = image.copy()
+        image.thumbnail(size, Image.LANCZOS)
+    if image_format == 'JPEG' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    buffer = BytesIO()
+    image.save(buffer, image_format, quality=82, optimize=True)
+    return ContentFile(buffer.getvalue())
+
+
+def delete_variants(storage, variants):
+    for name, path in variants.items():
+        if name != 'source':
+            storage.delete(path)
+
+
+def build_variants(recipe):
+    source = recipe.image.name
+    storage = recipe.image.storage
+    with storage.open(source) as file:
+        image = Image.open(file)
+        image.load()
+    stem = PurePosixPath(source).stem
+    variants = {'source': source}
+    for name, (size, image_format) in VARIANTS.items():
+        variants[name] = storage.save(
+            f'{VARIANTS_DIR}/{stem}_{name}.{EXTENSIONS[image_format]}',
+            render_variant(image, size, image_format)
+        )
+    if not Recipe.objects.filter(pk=recipe.pk, image=source).update(
+        image_variants=variants
+    ):
+        delete_variants(storage, variants)
+        return {}
+    bump_version('recipes')
+    delete_variants(storage, recipe.image_variants or {})
+    recipe.image_variants = variants
+    return variants
+
+
+def build_pending_variants(recipe_id):
+    recipe = Recipe.objects.only('image', 'image_variants').filter(
+        pk=recipe_id
+    ).first()
+    if recipe is not None and recipe.image and not get_variants(recipe):
+        build_variants(recipe)
+
+
+def process_recipe_image(recipe_id):
+    close_old_connections()
+    try:
+        build_pending_variants(recipe_id)
+    except Exception:
+        logger.exception('Не удалось обработать изображение рецепта %s',
+                         recipe_id)
+    finally:
+        close_old_connections()
+
+
+def schedule_image_processing(recipe_id):
+    if settings.RECIPE_IMAGE_WORKERS < 1 or connection.vendor == 'sqlite':
+        return
+    transaction.on_commit(
+        lambda: executor.submit(process_recipe_image, recipe_id)
+    )
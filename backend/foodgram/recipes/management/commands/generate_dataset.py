@@ -0,0 +1,246 @@
+import random
+import time
+from datetime import timedelta
+from io import BytesIO
+from itertools import islice
+
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import BaseCommand, CommandError, call_command
+from django.core.management.color import no_style
+from django.db import connection, transaction
+from django.db.models import Max
+from django.utils import timezone
+from PIL import Image
+
+from api.cache import bump_version
+from recipes.images import EXTENSIONS, VARIANTS, VARIANTS_DIR, render_variant
+from recipes.models import (Favorite, Ingredient, IngredientAmount, Recipe,
+                            ShoppingCart, Tag, get_tags_mask)
+from users.models import Follow
+
+User = get_user_model()
+
+PASSWORD = 'benchmark-password'
+UNITS = ('г', 'мл', 'шт.', 'ст. л.', 'ч. л.', 'по вкусу')
+DISHES = ('Салат', 'Суп', 'Пирог', 'Рагу', 'Запеканка', 'Каша', 'Омлет',
+          'Паста', 'Плов', 'Соус')
+WORDS = ('курица', 'говядина', 'картофель', 'лук', 'морковь', 'сыр',
+         'томаты', 'чеснок', 'запечь', 'обжарить', 'варить', 'тушить',
+         'перемешать', 'нарезать', 'посолить', 'подавать', 'горячим',
+         'духовка', 'сковорода', 'минут')
+
+
+def next_id(model):
+    return (model.objects.aggregate(max_id=Max('pk'))['max_id'] or 0) + 1
+
+
+def batched(objects, batch_size):
+    objects = iter(objects)
+    while True:
+        batch = list(islice(objects, batch_size))
+        if not batch:
+            return
+        yield batch
+
+
+class Command(BaseCommand):
+    help = 'Генерирует синтетический набор данных для нагрузочных тестов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--recipes', type=int, default=10000)
+        parser.add_argument('--tags', type=int, default=6)
+        parser.add_argument('--ingredients', type=int, default=2000)
+        parser.add_argument('--ingredients-per-recipe', type=int, default=8)
+        parser.add_argument('--follows', type=int, default=20)
+        parser.add_argument('--favorites', type=int, default=30)
+        parser.add_argument('--carts', type=int, default=5)
+        parser.add_argument('--days', type=int, default=365)
+        parser.add_argument('--prefix', default='bench')
+        parser.add_argument('--seed', type=int, default=42)
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def insert(self, model, objects, **kwargs):
+        total = 0
+        for batch in batched(objects, self.batch_size):
+            model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+        return total
+
+    def ensure_tags(self, count):
+        existing = set(Tag.objects.values_list('color', flat=True))
+        new = []
+        for index in range(Tag.objects.count(), count):
+            color = f'#{self.rng.randrange(0x1000000):06X}'
+            while color in existing:
+                color = f'#{self.rng.randrange(0x1000000):06X}'
+            existing.add(color)
+            slug = f'{self.prefix}-tag-{index}'
+            new.append(Tag(name=slug, color=color, slug=slug))
+        Tag.objects.bulk_create(new)
+        return list(Tag.objects.values_list('pk', flat=True))
+
+    def ensure_ingredients(self, count):
+        missing = count - Ingredient.objects.count()
+        self.insert(Ingredient, (
+            Ingredient(
+                name=f'{self.prefix} ингредиент {index}',
+                measurement_unit=self.rng.choice(UNITS)
+            ) for index in range(max(missing, 0))
+        ), ignore_conflicts=True)
+        return list(Ingredient.objects.values_list('pk', flat=True))
+
+    def create_image(self):
+        image = Image.new('RGB', (1200, 800), (230, 120, 60))
+        buffer = BytesIO()
+        image.save(buffer, 'JPEG', quality=90)
+        source = default_storage.save(
+            f'recipe_images/{self.prefix}.jpg', ContentFile(buffer.getvalue())
+        )
+        variants = {'source': source}
+        for name, (size, image_format) in VARIANTS.items():
+            variants[name] = default_storage.save(
+                f'{VARIANTS_DIR}/{self.prefix}_{name}.'
+                f'{EXTENSIONS[image_format]}',
+                render_variant(image, size, image_format)
+            )
+        return source, variants
+
+    def create_users(self, count):
+        first_id = next_id(User)
+        password = make_password(PASSWORD)
+        self.insert(User, (
+            User(
+                pk=pk,
+                username=f'{self.prefix}{pk}',
+                email=f'{self.prefix}{pk}@example.com',
+                first_name='Пользователь',
+                last_name=str(pk),
+                password=password,
+            ) for pk in range(first_id, first_id + count)
+        ))
+        return list(range(first_id, first_id + count))
+
+    def create_recipes(self, count, user_ids, tag_ids, days):
+        first_id = next_id(Recipe)
+        image, image_variants = self.create_image()
+        weights = [self.rng.paretovariate(1.16) for _ in user_ids]
+        now = timezone.now()
+        for batch in batched(range(first_id, first_id + count),
+                             self.batch_size):
+            recipes, tags = [], []
+            authors = self.rng.choices(user_ids, weights, k=len(batch))
+            for pk, author_id in zip(batch, authors):
+                recipe_tags = self.rng.sample(
+                    tag_ids, self.rng.randint(1, min(3, len(tag_ids)))
+                )
+                tags.extend(
+                    Recipe.tags.through(recipe_id=pk, tag_id=tag_id)
+                    for tag_id in recipe_tags
+                )
+                recipes.append(Recipe(
+                    pk=pk,
+                    author_id=author_id,
+                    name=f'{self.rng.choice(DISHES)} №{pk}',
+                    text=' '.join(self.rng.choices(WORDS, k=30)),
+                    image=image,
+                    image_variants=image_variants,
+                    cooking_time=self.rng.randint(5, 180),
+                    tags_mask=get_tags_mask(recipe_tags),
+                ))
+            Recipe.objects.bulk_create(recipes)
+            for recipe in recipes:
+                recipe.pub_date = now - timedelta(
+                    seconds=self.rng.uniform(0, days * 86400)
+                )
+            Recipe.objects.bulk_update(recipes, ('pub_date',))
+            Recipe.tags.through.objects.bulk_create(tags)
+        return list(range(first_id, first_id + count))
+
+    def create_amounts(self, recipe_ids, ingredient_ids, per_recipe):
+        per_recipe = min(per_recipe, len(ingredient_ids))
+        return self.insert(IngredientAmount, (
+            IngredientAmount(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=self.rng.randint(1, 500)
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in self.rng.sample(ingredient_ids, per_recipe)
+        ))
+
+    def pick_recipes(self, recipe_ids, count):
+        if not recipe_ids:
+            return set()
+        return {
+            recipe_ids[int(len(recipe_ids) * self.rng.random() ** 2)]
+            for _ in range(count)
+        }
+
+    def create_follows(self, user_ids, count):
+        return self.insert(Follow, (
+            Follow(user_id=user_id, author_id=author_id)
+            for user_id in user_ids
+            for author_id in set(self.rng.sample(
+                user_ids, min(count + 1, len(user_ids))
+            )) - {user_id}
+        ), ignore_conflicts=True)
+
+    def create_user_recipes(self, model, user_ids, recipe_ids, count):
+        return self.insert(model, (
+            model(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in self.pick_recipes(recipe_ids, count)
+        ), ignore_conflicts=True)
+
+    def handle(self, *args, **options):
+        if options['users'] < 1:
+            raise CommandError('--users должен быть больше нуля')
+        if options['batch_size'] < 1:
+            raise CommandError('--batch-size должен быть больше нуля')
+        self.rng = random.Random(options['seed'])
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+
+        started = time.monotonic()
+        with transaction.atomic():
+            tag_ids = self.ensure_tags(options['tags'])
+            ingredient_ids = self.ensure_ingredients(options['ingredients'])
+            user_ids = self.create_users(options['users'])
+            recipe_ids = self.create_recipes(
+                options['recipes'], user_ids, tag_ids, options['days']
+            )
+            amounts = self.create_amounts(
+                recipe_ids, ingredient_ids, options['ingredients_per_recipe']
+            )
+            follows = self.create_follows(user_ids, options['follows'])
+            favorites = self.create_user_recipes(
+                Favorite, user_ids, recipe_ids, options['favorites']
+            )
+            carts = self.create_user_recipes(
+                ShoppingCart, user_ids, recipe_ids, options['carts']
+            )
+            with connection.cursor() as cursor:
+                for sql in connection.ops.sequence_reset_sql(
+                    no_style(), (User, Recipe)
+                ):
+                    cursor.execute(sql)
+        generated = time.monotonic() - started
+
+        call_command('rebuild_counters', stdout=self.stdout)
+        call_command('refresh_rankings', stdout=self.stdout)
+        bump_version('tags')
+        bump_version('ingredients')
+        bump_version('recipes')
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Пользователей: {len(user_ids)}, рецептов: {len(recipe_ids)}, '
+            f'ингредиентов в рецептах: {amounts}, подписок: {follows}, '
+            f'избранного: {favorites}, покупок: {carts}. '
+            f'Вставка: {generated:.2f} с, '
+            f'всего: {time.monotonic() - started:.2f} с. '
+            f'Пароль пользователей: {PASSWORD}'
+        ))
@@ -0,0 +1,54 @@
+import time
+
+from django.core.management import BaseCommand
+from django.db.models import F, Q
+from django.db.models.fields.json import KeyTextTransform
+
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    help = 'Создаёт уменьшенные копии и WebP-версии изображений рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--all', action='store_true')
+        parser.add_argument('--watch', type=float, default=0)
+
+    def get_pending(self, process_all):
+        recipes = Recipe.objects.exclude(image='').only(
+            'image', 'image_variants'
+        ).order_by('pk')
+        if process_all:
+            return recipes
+        return recipes.alias(
+            variants_source=KeyTextTransform('source', 'image_variants')
+        ).filter(
+            Q(variants_source__isnull=True) | ~Q(variants_source=F('image'))
+        )
+
+    def process(self, process_all):
+        processed = failed = 0
+        for recipe in self.get_pending(process_all).iterator():
+            try:
+                build_variants(recipe)
+            except Exception as error:
+                failed += 1
+                self.stderr.write(f'Рецепт {recipe.pk}: {error}')
+            else:
+                processed += 1
+        return processed, failed
+
+    def handle(self, *args, **options):
+        while True:
+            started = time.monotonic()
+            processed, failed = self.process(options['all'])
+            if processed or failed or not options['watch']:
+                self.stdout.write(self.style.SUCCESS(
+                    f'Обработано изображений: {processed}, ошибок: {failed}, '
+                    f'время: {time.monotonic() - started:.2f} с'
+                ))
+            if not options['watch']:
+                return
+            options['all'] = False
+            time.sleep(options['watch'])
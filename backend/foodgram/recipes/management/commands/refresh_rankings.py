@@ -0,0 +1,54 @@
+import time
+from itertools import islice
+
+from django.core.management import BaseCommand
+from django.db import transaction
+from django.utils import timezone
+
+from api.cache import bump_version
+from recipes.models import Recipe, RecipeRank
+
+FAVORITE_WEIGHT = 2
+CART_WEIGHT = 1
+GRAVITY = 1.5
+
+
+def build_rank(recipe_id, favorites_count, carts_count, pub_date, now):
+    popular = favorites_count * FAVORITE_WEIGHT + carts_count * CART_WEIGHT
+    age_hours = max((now - pub_date).total_seconds() / 3600, 0)
+    return RecipeRank(
+        recipe_id=recipe_id,
+        popular=popular,
+        trending=popular / (age_hours + 2) ** GRAVITY
+    )
+
+
+class Command(BaseCommand):
+    help = 'Пересчитывает рейтинги популярности рецептов'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        now = timezone.now()
+        recipes = Recipe.objects.order_by().values_list(
+            'id', 'favorites_count', 'carts_count', 'pub_date'
+        ).iterator(chunk_size=options['batch_size'])
+        total = 0
+        with transaction.atomic():
+            RecipeRank.objects.all().delete()
+            while True:
+                batch = [
+                    build_rank(*recipe, now)
+                    for recipe in islice(recipes, options['batch_size'])
+                ]
+                if not batch:
+                    break
+                RecipeRank.objects.bulk_create(batch)
+                total += len(batch)
+        bump_version('recipes')
+        self.stdout.write(self.style.SUCCESS(
+            f'Пересчитано рейтингов: {total} '
+            f'за {time.monotonic() - started:.2f} с'
+        ))
@@ -0,0 +1,126 @@
+from django.db import migrations
+
+CREATE_TRIGGERS = """
+CREATE FUNCTION recipes_search_vector(
+    recipe_id bigint, recipe_name text, recipe_text text
+) RETURNS tsvector LANGUAGE sql STABLE AS $$
+    SELECT setweight(to_tsvector('russian', coalesce(recipe_name, '')), 'A')
+        || setweight(to_tsvector('russian', coalesce((
+            SELECT string_agg(ingredient.name, ' ')
+            FROM recipes_ingredientamount amount
+            JOIN recipes_ingredient ingredient
+                ON ingredient.id = amount.ingredient_id
+            WHERE amount.recipe_id = recipes_search_vector.recipe_id
+        ), '')), 'B')
+        || setweight(to_tsvector('russian', coalesce(recipe_text, '')), 'C')
+$$;
+
+CREATE FUNCTION recipes_recipe_search_vector() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    NEW.search_vector := recipes_search_vector(NEW.id, NEW.name, NEW.text);
+    RETURN NEW;
+END
+$$;
+
+CREATE TRIGGER recipes_recipe_search_vector
+BEFORE INSERT OR UPDATE OF name, text ON recipes_recipe
+FOR EACH ROW EXECUTE FUNCTION recipes_recipe_search_vector();
+
+CREATE FUNCTION recipes_ingredientamount_search_vector() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    IF TG_OP = 'INSERT' THEN
+        UPDATE recipes_recipe recipe SET search_vector = recipes_search_vector(
+            recipe.id, recipe.name, recipe.text
+        ) WHERE recipe.id IN (SELECT recipe_id FROM new_rows);
+    ELSIF TG_OP = 'DELETE' THEN
+        UPDATE recipes_recipe recipe SET search_vector = recipes_search_vector(
+            recipe.id, recipe.name, recipe.text
+        ) WHERE recipe.id IN (SELECT recipe_id FROM old_rows);
+    ELSE
+        UPDATE recipes_recipe recipe SET search_vector = recipes_search_vector(
+            recipe.id, recipe.name, recipe.text
+        ) WHERE recipe.id IN (
+            SELECT unnest(ARRAY[new_row.recipe_id, old_row.recipe_id])
+            FROM new_rows new_row JOIN old_rows old_row USING (id)
+            WHERE new_row.ingredient_id <> old_row.ingredient_id
+                OR new_row.recipe_id <> old_row.recipe_id
+        );
+    END IF;
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER recipes_ingredientamount_insert_search_vector
+AFTER INSERT ON recipes_ingredientamount
+REFERENCING NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredientamount_search_vector();
+
+CREATE TRIGGER recipes_ingredientamount_update_search_vector
+AFTER UPDATE ON recipes_ingredientamount
+REFERENCING OLD TABLE AS old_rows NEW TABLE AS new_rows
+FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredientamount_search_vector();
+
+CREATE TRIGGER recipes_ingredientamount_delete_search_vector
+AFTER DELETE ON recipes_ingredientamount
+REFERENCING OLD TABLE AS old_rows
+FOR EACH STATEMENT EXECUTE FUNCTION recipes_ingredientamount_search_vector();
+
+CREATE FUNCTION recipes_ingredient_search_vector() RETURNS trigger
+LANGUAGE plpgsql AS $$
+BEGIN
+    UPDATE recipes_recipe recipe SET search_vector = recipes_search_vector(
+        recipe.id, recipe.name, recipe.text
+    ) WHERE recipe.id IN (
+        SELECT recipe_id FROM recipes_ingredientamount
+        WHERE ingredient_id = NEW.id
+    );
+    RETURN NULL;
+END
+$$;
+
+CREATE TRIGGER recipes_ingredient_search_vector
+AFTER UPDATE OF name ON recipes_ingredient
+FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+EXECUTE FUNCTION recipes_ingredient_search_vector();
+
+UPDATE recipes_recipe
+SET search_vector = recipes_search_vector(id, name, text);
+"""
+
+DROP_TRIGGERS = """
+DROP TRIGGER recipes_ingredient_search_vector ON recipes_ingredient;
+DROP FUNCTION recipes_ingredient_search_vector();
+DROP TRIGGER recipes_ingredientamount_delete_search_vector
+    ON recipes_ingredientamount;
+DROP TRIGGER recipes_ingredientamount_update_search_vector
+    ON recipes_ingredientamount;
+DROP TRIGGER recipes_ingredientamount_insert_search_vector
+    ON recipes_ingredientamount;
+DROP FUNCTION recipes_ingredientamount_search_vector();
+DROP TRIGGER recipes_recipe_search_vector ON recipes_recipe;
+DROP FUNCTION recipes_recipe_search_vector();
+DROP FUNCTION recipes_search_vector(bigint, text, text);
+"""
+
+
+def run_postgres_sql(sql):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor == 'postgresql':
+            schema_editor.execute(sql)
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_recipe_image_variants'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_postgres_sql(CREATE_TRIGGERS),
+            run_postgres_sql(DROP_TRIGGERS),
+        ),
+    ]
@@ -1,12 +1,32 @@
+from functools import reduce
+from operator import or_
+
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.indexes import GinIndex
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.core.exceptions import EmptyResultSet
 from django.core.validators import MinValueValidator, RegexValidator
-from django.db import models
-from django.db.models import Exists, OuterRef
+from django.db import connection, models
+from django.db.models import Exists, F, OuterRef, Prefetch, Q
+from django.db.models.expressions import RawSQL, Window
+from django.db.models.functions import RowNumber
+
+from .deletion import TrackedDeleteMixin
 
 User = get_user_model()
 
+SEARCH_CONFIG = 'russian'
+TAGS_MASK_BITS = 63
+
+
+def get_tags_mask(tag_ids):
+    return reduce(
+        or_, (1 << tag_id for tag_id in tag_ids if tag_id < TAGS_MASK_BITS), 0
+    )
+
 
-class CustomRecipeManager(models.Manager):
+class RecipeQuerySet(TrackedDeleteMixin, models.QuerySet):
     def add_favorite_cart(self, user):
         return self.annotate(
             is_favorited=Exists(
@@ -21,8 +41,70 @@ class CustomRecipeManager(models.Manager):
             ),
         )
 
+    def with_related(self):
+        return self.select_related('author').prefetch_related(
+            'tags',
+            Prefetch(
+                'ingredient',
+                queryset=IngredientAmount.objects.select_related('ingredient')
+            ),
+        )
 
-class Recipe(models.Model):
+    def limit_per_author(self, limit):
+        ranked = self.order_by().annotate(
+            position=Window(
+                expression=RowNumber(),
+                partition_by=F('author_id'),
+                order_by=(F('pub_date').desc(), F('id').desc()),
+            )
+        ).values('id', 'position')
+        try:
+            sql, params = ranked.query.sql_with_params()
+        except EmptyResultSet:
+            return self.none()
+        return self.model.objects.filter(pk__in=RawSQL(
+            f'SELECT id FROM ({sql}) AS ranked WHERE "position" <= %s',
+            (*params, limit)
+        ))
+
+    def with_tags(self, tag_ids, match_all=False):
+        if not tag_ids:
+            return self
+        mask = get_tags_mask(tag_ids)
+        conditions = [
+            Q(Exists(self.model.tags.through.objects.filter(
+                recipe=OuterRef('pk'), tag_id=tag_id
+            )))
+            for tag_id in tag_ids if tag_id >= TAGS_MASK_BITS
+        ]
+        queryset = self.alias(matched_tags=F('tags_mask').bitand(mask))
+        if match_all:
+            return queryset.filter(Q(matched_tags=mask), *conditions)
+        if mask:
+            conditions.append(~Q(matched_tags=0))
+        return queryset.filter(reduce(or_, conditions))
+
+    def search(self, text):
+        if connection.vendor != 'postgresql':
+            return self.filter(
+                Q(name__icontains=text)
+                | Q(text__icontains=text)
+                | Q(Exists(IngredientAmount.objects.filter(
+                    recipe=OuterRef('pk'),
+                    ingredient__name__icontains=text
+                )))
+            )
+        query = SearchQuery(text, config=SEARCH_CONFIG, search_type='websearch')
+        return self.filter(search_vector=query).annotate(
+            search_rank=SearchRank(F('search_vector'), query)
+        ).order_by('-search_rank', '-pub_date')
+
+
+class CustomRecipeManager(models.Manager.from_queryset(RecipeQuerySet)):
+    pass
+
+
+class Recipe(TrackedDeleteMixin, models.Model):
     name = models.CharField(
         verbose_name='Название рецепта',
         max_length=200
@@ -44,6 +126,7 @@ class Recipe(models.Model):
         upload_to='recipe_images/',
         verbose_name='Изображение рецепта'
     )
+    image_variants = models.JSONField(default=dict, editable=False)
     ingredients = models.ManyToManyField(
         'Ingredient',
         through='IngredientAmount',
@@ -59,6 +142,18 @@ class Recipe(models.Model):
         verbose_name='Время приготовления',
         validators=()
     )
+    favorites_count = models.PositiveIntegerField(
+        verbose_name='В избранном',
+        default=0,
+        editable=False
+    )
+    carts_count = models.PositiveIntegerField(
+        verbose_name='В списках покупок',
+        default=0,
+        editable=False
+    )
+    tags_mask = models.BigIntegerField(default=0, editable=False)
+    search_vector = SearchVectorField(null=True, editable=False)
     objects = CustomRecipeManager()
 
     class Meta:
@@ -71,11 +166,42 @@ class Recipe(models.Model):
                 name='unique_recipe_author'
             ),
         )
+        indexes = (
+            models.Index(fields=('-pub_date', '-id')),
+            GinIndex(fields=('search_vector',), name='recipe_search_vector_idx'),
+        )
 
     def __str__(self):
         return f'id: {self.pk}, название: {self.name[:30]}'
 
 
+class RecipeRank(models.Model):
+    recipe = models.OneToOneField(
+        Recipe,
+        verbose_name='Рецепт',
+        primary_key=True,
+        related_name='rank',
+        on_delete=models.CASCADE
+    )
+    popular = models.FloatField(verbose_name='Популярность')
+    trending = models.FloatField(verbose_name='Набирает популярность')
+    updated = models.DateTimeField(
+        auto_now=True,
+        verbose_name='Дата пересчёта'
+    )
+
+    class Meta:
+        verbose_name = 'Рейтинг рецепта'
+        verbose_name_plural = 'Рейтинги рецептов'
+        indexes = (
+            models.Index(fields=('-popular',)),
+            models.Index(fields=('-trending',)),
+        )
+
+    def __str__(self):
+        return f'{self.recipe_id}: {self.popular:.1f} / {self.trending:.3f}'
+
+
 class Ingredient(models.Model):
     name = models.CharField(max_length=200)
     measurement_unit = models.CharField(max_length=200)
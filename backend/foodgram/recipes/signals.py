@@ -0,0 +1,110 @@
+from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import F
+from django.db.models.functions import Greatest
+from django.db.models.signals import (m2m_changed, post_delete, post_save,
+                                      pre_delete)
+from django.dispatch import receiver
+
+from users.models import Follow
+from .deletion import get_deleting
+from .images import (delete_variants, get_variants,
+                     schedule_image_processing)
+from .models import Favorite, Recipe, ShoppingCart, Tag, get_tags_mask
+
+User = get_user_model()
+
+COUNTERS = (
+    (Favorite, Recipe, 'recipe', 'favorites_count'),
+    (ShoppingCart, Recipe, 'recipe', 'carts_count'),
+    (Recipe, User, 'author', 'recipes_count'),
+    (Follow, User, 'author', 'followers_count'),
+)
+
+def remember_deleting(sender, instance, **kwargs):
+    get_deleting(sender).add(instance.pk)
+
+
+for model in {model for _, model, _, _ in COUNTERS}:
+    pre_delete.connect(remember_deleting, sender=model)
+
+
+def change_counter(instance, model, field, counter, delta):
+    relation = instance._meta.get_field(field)
+    if delta < 0 and getattr(instance, relation.attname) in get_deleting(
+        model
+    ):
+        return
+    model.objects.filter(pk=getattr(instance, relation.attname)).update(
+        **{counter: Greatest(F(counter) + delta, 0)}
+    )
+    if relation.is_cached(instance):
+        target = relation.get_cached_value(instance)
+        if counter not in target.get_deferred_fields():
+            setattr(target, counter, max(getattr(target, counter) + delta, 0))
+
+
+def connect_counter(sender, model, field, counter):
+    def increment(instance, created, **kwargs):
+        if created:
+            change_counter(instance, model, field, counter, 1)
+
+    def decrement(instance, **kwargs):
+        change_counter(instance, model, field, counter, -1)
+
+    post_save.connect(increment, sender=sender, weak=False)
+    post_delete.connect(decrement, sender=sender, weak=False)
+
+
+for sender, model, field, counter in COUNTERS:
+    connect_counter(sender, model, field, counter)
+
+
+def change_tags_mask(recipes, tag_ids, add):
+    mask = get_tags_mask(tag_ids)
+    if mask:
+        recipes.update(tags_mask=(
+            F('tags_mask').bitor(mask) if add
+            else F('tags_mask').bitand(~mask)
+        ))
+    return mask
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def sync_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('post_add', 'post_remove', 'pre_clear'):
+        return
+    if action == 'pre_clear':
+        pk_set = set(sender.objects.filter(
+            **{'tag_id' if reverse else 'recipe_id': instance.pk}
+        ).values_list('recipe_id' if reverse else 'tag_id', flat=True))
+    add = action == 'post_add'
+    if reverse:
+        change_tags_mask(
+            Recipe.objects.filter(pk__in=pk_set), [instance.pk], add
+        )
+        return
+    mask = change_tags_mask(Recipe.objects.filter(pk=instance.pk), pk_set, add)
+    instance.tags_mask = (
+        instance.tags_mask | mask if add else instance.tags_mask & ~mask
+    )
+
+
+@receiver(pre_delete, sender=Tag)
+def clear_deleted_tag(instance, **kwargs):
+    change_tags_mask(
+        Recipe.objects.filter(tags=instance), [instance.pk], False
+    )
+
+
+@receiver(post_save, sender=Recipe)
+def process_recipe_image(instance, **kwargs):
+    if instance.image and not get_variants(instance):
+        schedule_image_processing(instance.pk)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_variants(instance, **kwargs):
+    storage, variants = instance.image.storage, instance.image_variants
+    if variants:
+        transaction.on_commit(lambda: delete_variants(storage, variants))
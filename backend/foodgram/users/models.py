@@ -1,8 +1,18 @@
-from django.contrib.auth.models import AbstractUser
+from django.contrib.auth.models import AbstractUser, UserManager
 from django.db import models
 
+from recipes.deletion import TrackedDeleteMixin
 
-class User(AbstractUser):
+
+class UserQuerySet(TrackedDeleteMixin, models.QuerySet):
+    pass
+
+
+class CustomUserManager(UserManager.from_queryset(UserQuerySet)):
+    pass
+
+
+class User(TrackedDeleteMixin, AbstractUser):
     username = models.CharField(
         verbose_name='Имя пользователя',
         max_length=150,
@@ -21,6 +31,17 @@ class User(AbstractUser):
         verbose_name='Фамилия',
         max_length=150
     )
+    recipes_count = models.PositiveIntegerField(
+        verbose_name='Количество рецептов',
+        default=0,
+        editable=False
+    )
+    followers_count = models.PositiveIntegerField(
+        verbose_name='Количество подписчиков',
+        default=0,
+        editable=False
+    )
+    objects = CustomUserManager()
 
     class Meta:
         verbose_name = 'Пользователь'